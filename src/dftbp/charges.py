@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: charges
+# Creation: Oct 19, 2026
+#
+
+"""Check the charges.bin written by dftb+ before restarting from it.
+
+dftb+ writes the SCC charges in charges.bin (Fortran unformatted file). When a
+client is restarted in the same REM directory the charges of the previous run
+are a much better starting point than the neutral atoms, but only if the file
+is complete and belongs to the same system. This module checks exactly that.
+
+The module does not import anything from the package on purpose: the job
+scripts run it directly on the compute node as::
+
+    $ python3 charges.py charges.bin NATOM
+
+and the exit status is 0 only if the file can be used.
+
+"""
+
+import os
+import struct
+import sys
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+class ChargeFile(object):
+    """A charges.bin file as written by dftb+.
+
+    The file is made of Fortran sequential records, each one enclosed by two
+    4 bytes markers containing the record length. The first record contains
+    the format version, the second one the header (flags, number of atoms,
+    number of spins and the total charge) and then there is one record per
+    atom and spin with the orbital charges.
+
+    Args:
+        filepath: path of the charges.bin file.
+
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.records = []
+        self.natom = None
+
+    def read(self):
+        """Split the file in records.
+
+        Returns False if the record markers are inconsistent, i.e. the file
+        has been truncated (a killed job) or is not a Fortran unformatted file.
+
+        """
+        if not os.path.isfile(self.filepath):
+            return False
+        with open(self.filepath, 'rb') as chargef:
+            data = chargef.read()
+
+        records = []
+        pos = 0
+        while pos < len(data):
+            if pos + 4 > len(data):
+                return False
+            length = struct.unpack('<i', data[pos:pos + 4])[0]
+            end = pos + 4 + length
+            if length < 0 or end + 4 > len(data):
+                return False
+            if struct.unpack('<i', data[end:end + 4])[0] != length:
+                return False
+            records.append(data[pos + 4:end])
+            pos = end + 4
+        self.records = records
+        return len(records) > 2
+
+    def _header_natom(self, natom):
+        """Look for the number of atoms among the integers of the header."""
+        header = self.records[1]
+        nint = len(header) // 4
+        integers = struct.unpack('<{:d}i'.format(nint), header[:4 * nint])
+        return natom in integers
+
+    def is_valid(self, natom):
+        """Return True if the file can be used to restart a natom system.
+
+        Args:
+            natom: number of atoms of the system that will read the charges.
+
+        """
+        if not self.read():
+            return False
+        if not self._header_natom(int(natom)):
+            return False
+        # One record per atom (and spin) after the version and the header
+        return len(self.records) - 2 >= int(natom)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.stderr.write('Usage: {} charges.bin NATOM\n'.format(sys.argv[0]))
+        sys.exit(2)
+    if ChargeFile(sys.argv[1]).is_valid(int(sys.argv[2])):
+        sys.exit(0)
+    sys.exit(1)
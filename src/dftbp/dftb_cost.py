@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: dftb_cost
+# Creation: Oct 19, 2026
+#
+
+"""A rough cost model for a dftb+ force call.
+
+The cost of a dftb+ step is dominated by the diagonalisation of the
+Hamiltonian (cubic in the number of orbitals) repeated for each SCC iteration,
+plus the construction of the Hamiltonian and of the Coulomb matrix (quadratic
+in the number of atoms). This module estimates those terms from the geometry
+and the parameters set and uses them to choose the eigensolver, the SCC mixer
+and the number of threads.
+
+The same terms give the memory and the walltime to ask the scheduler for.
+The prefactors are not calibrated on any machine: they only set the scaling
+of the terms. For this reason the eigensolver is chosen only between the two
+LAPACK solvers that are safe for any size (RelativelyRobust and
+DivideAndConquer), and the walltime should come from a per-step cost
+measured on a previous run (step_cost).
+
+"""
+
+import math
+from dftbp.dftb_data import DftbData
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+class DftbCostModel(object):
+    """Estimate the cost of a dftb+ step and choose the settings accordingly.
+
+    Args:
+        Geometry: geometry object as defined in the libs module.
+        parameters_set: name of the parameters set (see DftbData).
+        processors: largest number of threads that can be given to dftb+.
+        scc: True if the computation is self-consistent.
+        kpoints: number of (irreducible) k-points; each one needs its own
+            diagonalisation.
+
+    Attributes:
+        flops: floating point operations per second of one core.
+        scc_iterations: SCC iterations expected for each MD step (the charges
+            of the previous step are a good guess during an MD).
+        solvers: prefactors of the n^3 and n^2 terms of each candidate
+            eigensolver (uncalibrated guesses).
+        solver_matrices: dense norb x norb matrices each eigensolver keeps
+            besides the eigenvectors (Hamiltonian, overlap and workspace).
+        base_memory: memory (MB) that does not depend on the basis size
+            (executable, Slater-Koster tables, sparse matrices).
+        startup_time: seconds to start dftb+ and to converge the first SCC.
+        step_overhead: seconds per MD step outside the force computation
+            (socket exchange with i-PI, output).
+
+    """
+    orbitals = dict(s=1, p=4, d=9, f=16)
+
+    flops = 1.0e10
+    scc_iterations = 8
+    solvers = {
+        'DivideAndConquer{}': (4.0, 2.0e3),
+        'RelativelyRobust{}': (6.0, 1.0e3),
+    }
+    # Work per pair of atoms (Hamiltonian, overlap and gamma matrix)
+    pair_work = 2.0e3
+
+    solver_matrices = {
+        'DivideAndConquer{}': 5,
+        'RelativelyRobust{}': 4,
+    }
+    base_memory = 200.0
+    startup_time = 300.0
+    step_overhead = 0.01
+    # Margins on the estimates asked to the scheduler
+    memory_margin = 1.3
+    time_margin = 1.5
+
+    def __init__(self, Geometry, parameters_set, processors=1, scc=True,
+                 kpoints=1):
+        self.Geometry = Geometry
+        self.parameters_set = parameters_set
+        self.processors = int(processors)
+        self.scc = scc
+        self.kpoints = int(kpoints)
+        self.natom = Geometry.natom
+        self.norb = self._count_orbitals()
+
+    def _count_orbitals(self):
+        """Return the number of basis functions of the system.
+
+        Each atom brings all the shells up to its max_angular_momentum, e.g.
+        an atom with max_angular_momentum p has one s and three p orbitals.
+
+        """
+        data = DftbData(self.parameters_set)
+        per_specie = [self.orbitals[data.find_data_per_atom(
+            atype, 'max_angular_momentum')]
+                      for atype in self.Geometry.specienames]
+        return sum(per_specie[i] for i in self.Geometry.indexes)
+
+    def _iterations(self):
+        return self.scc_iterations if self.scc else 1
+
+    def diagonalisation(self, solver):
+        """Seconds spent in the eigensolver for one MD step on one core."""
+        cubic, quadratic = self.solvers[solver]
+        work = cubic * self.norb ** 3 + quadratic * self.norb ** 2
+        return self._iterations() * self.kpoints * work / self.flops
+
+    def construction(self):
+        """Seconds spent building the matrices for one MD step on one core."""
+        return self._iterations() * self.pair_work * self.natom ** 2 / \
+            self.flops
+
+    def speedup(self, solver, threads):
+        """Amdahl speedup with the matrix construction as serial part."""
+        serial = self.construction()
+        parallel = self.diagonalisation(solver)
+        return (serial + parallel) / (serial + parallel / threads)
+
+    def step_time(self, solver, threads):
+        """Estimated seconds per MD step."""
+        total = self.construction() + self.diagonalisation(solver)
+        return total / self.speedup(solver, threads)
+
+    def memory(self, solver):
+        """Estimated memory (MB) of one dftb+ client.
+
+        The eigenvectors of every k-point are kept, plus the matrices of the
+        eigensolver; periodic systems use complex matrices.
+
+        """
+        size = 16 if self.Geometry.periodic else 8
+        matrices = self.kpoints + self.solver_matrices[solver]
+        dense = matrices * self.norb ** 2 * size / 2.0 ** 20
+        return self.base_memory + dense
+
+    def walltime(self, nstep, solver, threads, step_cost=None):
+        """Estimated seconds for nstep MD steps.
+
+        Args:
+            nstep: number of MD steps.
+            solver: the eigensolver.
+            threads: threads of the client.
+            step_cost: measured seconds per step (e.g. from a previous run
+                on the same system); if None the step time of the model is
+                used.
+
+        """
+        if step_cost is None:
+            step_cost = self.step_time(solver, threads) + self.step_overhead
+        return self.startup_time + int(nstep) * float(step_cost)
+
+    def resources(self, nstep, solver, threads, step_cost=None):
+        """Return the memory (MB) and the walltime (s) to ask for one client.
+
+        The estimates are increased by memory_margin and time_margin; the
+        memory is rounded up to 100 MB and the walltime to one minute.
+
+        """
+        mem = self.memory_margin * self.memory(solver)
+        time = self.time_margin * self.walltime(nstep, solver, threads,
+                                                step_cost)
+        return (int(math.ceil(mem / 100.0)) * 100,
+                int(math.ceil(time / 60.0)) * 60)
+
+    def best_solver(self):
+        """Return the cheapest of the candidate eigensolvers."""
+        return min(self.solvers, key=self.diagonalisation)
+
+    def best_threads(self, solver, efficiency=0.5):
+        """Largest number of threads still used with the given efficiency.
+
+        Small systems do not profit from many threads: giving them the
+        processors only slows down the queue.
+
+        """
+        threads = 1
+        for nthreads in range(1, self.processors + 1):
+            if self.speedup(solver, nthreads) / nthreads >= efficiency:
+                threads = nthreads
+        return threads
+
+    def mixer(self):
+        """Return the SCC mixer keywords suited to the size of the system.
+
+        Large systems are prone to charge sloshing: a smaller mixing
+        parameter avoids the oscillations that would cost hundreds of SCC
+        iterations.
+
+        """
+        if self.natom < 200:
+            return dict(Hamiltonian_Mixer_='Broyden',
+                        Hamiltonian_Mixer_MixingParameter=0.2)
+        return dict(Hamiltonian_Mixer_='Broyden',
+                    Hamiltonian_Mixer_MixingParameter=0.05)
+
+    def select(self):
+        """Return the keywords and the number of threads to be used.
+
+        Returns:
+            A tuple (keywords, threads). The keywords are in the *string*
+            format of InputDftb.
+
+        """
+        solver = self.best_solver()
+        keywords = dict(Hamiltonian_Eigensolver=solver)
+        if self.scc:
+            keywords.update(self.mixer())
+            keywords['Hamiltonian_SCCTolerance'] = \
+                '1.000E-05' if self.natom < 1000 else '1.000E-04'
+        return keywords, self.best_threads(solver)
+
+    def report(self):
+        """Return a summary of the model as a printable string."""
+        msg = 'DFTB cost model (uncalibrated): {:d} atoms, {:d} orbitals, ' \
+              '{:d} k-points, {:d} SCC iterations per step\n'.format(
+                  self.natom, self.norb, self.kpoints, self._iterations())
+        row = '  {:22s} {:>8s} {:>12s} {:>12s} {:>10s}\n'
+        msg += row.format('Eigensolver', 'threads', 's/step', 'speedup',
+                          'MB')
+        for solver in sorted(self.solvers, key=self.diagonalisation):
+            threads = self.best_threads(solver)
+            msg += row.format(solver,
+                              str(threads),
+                              '{:.3e}'.format(self.step_time(solver, threads)),
+                              '{:.2f}'.format(self.speedup(solver, threads)),
+                              '{:.0f}'.format(self.memory(solver)))
+        keywords, threads = self.select()
+        msg += 'Selected: {} with {:d} thread(s)\n'.format(
+            ', '.join('{}={}'.format(k, v) for k, v in sorted(keywords.items())),
+            threads)
+        return msg
@@ -32,6 +32,11 @@ __email__ = 'riccardo.petraglia@gmail.com'
 __status__ = 'development'
 
 
+# Boltzmann constant in Hartree/K: used to convert temperatures in the
+# electronic temperature expected by the Filling block.
+KELVIN_TO_HARTREE = 0.000003166808534191
+
+
 class DftbData(object):
     """Parameters set's data to write into the dftbp input.
 
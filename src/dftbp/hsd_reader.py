@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: hsd_reader
+# Creation: Oct 19, 2026
+#
+
+"""Read an existing hsd file in the *string* keyword format of InputDftb.
+
+The parser is a single pass over the file: the lines are split on the curly
+brackets, every opening bracket pushes the name of the block on a stack and
+every closing bracket pops it. The keywords are then named joining the stack
+with underscores, exactly as InputDftb does::
+
+    Hamiltonian = DFTB {              Hamiltonian_ = 'DFTB'
+      Filling = Fermi {       --->    Hamiltonian_Filling_ = 'Fermi'
+        Temperature = 0.001           Hamiltonian_Filling_Temperature = '0.001'
+
+Lines without an equal sign (e.g. the GenFormat geometry or the k-points) are
+collected in the *_empty* keyword of their block. Empty blocks as
+RelativelyRobust{} or i-PI{} are kept as plain values.
+
+"""
+
+import os
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+class HsdReader(object):
+    """Parser for the hsd files of dftb+.
+
+    Args:
+        filepath: path of the hsd file to be read.
+
+    Note:
+        The keywords are returned in the order they appear in the file. Values
+        are kept as strings: InputDftb writes them back with str().
+        Unit modifiers (Temperature [Kelvin] = 300) are not part of the
+        keyword: after read() they are found in the modifiers dictionary.
+
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.modifiers = {}
+
+    @staticmethod
+    def _strip_comment(line):
+        """Remove a # comment that is not inside a quoted string."""
+        quote = None
+        for i, char in enumerate(line):
+            if quote:
+                if char == quote:
+                    quote = None
+            elif char in '"\'':
+                quote = char
+            elif char == '#':
+                return line[:i]
+        return line
+
+    @staticmethod
+    def _split(line):
+        """Split a line on the curly brackets.
+
+        Each returned token is a closing bracket, a block header ending with
+        an opening bracket or a plain statement. Empty blocks ({}) are left
+        attached to their word.
+
+        """
+        tokens = []
+        current = ''
+        quote = None
+        i = 0
+        while i < len(line):
+            char = line[i]
+            if quote:
+                current += char
+                if char == quote:
+                    quote = None
+            elif char in '"\'':
+                quote = char
+                current += char
+            elif char == '{':
+                rest = line[i + 1:].lstrip()
+                if rest.startswith('}'):
+                    current += '{}'
+                    i = len(line) - len(rest)
+                else:
+                    tokens.append(current.strip() + '{')
+                    current = ''
+            elif char == '}':
+                if current.strip():
+                    tokens.append(current.strip())
+                tokens.append('}')
+                current = ''
+            else:
+                current += char
+            i += 1
+        if current.strip():
+            tokens.append(current.strip())
+        return tokens
+
+    def tokens(self):
+        with open(self.filepath) as hsdf:
+            for line in hsdf:
+                line = self._strip_comment(line).strip()
+                if not line:
+                    continue
+                for token in self._split(line):
+                    yield token
+
+    def _name(self, key, name):
+        """Strip the unit modifier from name and record it for key."""
+        name = name.strip()
+        if name.endswith(']') and '[' in name:
+            name, _, modifier = name[:-1].partition('[')
+            name = name.strip()
+            self.modifiers[key.format(name)] = '[{}]'.format(modifier.strip())
+        return name
+
+    def read(self):
+        """Return the list of (keyword, value) couples of the file."""
+        keywords = []
+        empty = {}
+        stack = []
+        self.modifiers = {}
+        for token in self.tokens():
+            prefix = ''.join(name + '_' for name in stack)
+            if token == '}':
+                if not stack:
+                    raise HsdSyntaxError(self.filepath, 'unbalanced }')
+                stack.pop()
+            elif token.endswith('{'):
+                name, _, value = token[:-1].partition('=')
+                name = self._name(prefix + '{}_', name)
+                keywords.append((prefix + name + '_', value.strip()))
+                stack.append(name)
+            elif '=' in token:
+                name, _, value = token.partition('=')
+                name = self._name(prefix + '{}', name)
+                keywords.append((prefix + name, value.strip()))
+            else:
+                if not stack:
+                    raise HsdSyntaxError(self.filepath,
+                                         'text outside blocks: ' + token)
+                key = prefix + 'empty'
+                if key not in empty:
+                    empty[key] = len(keywords)
+                    keywords.append((key, token))
+                else:
+                    old_key, old_value = keywords[empty[key]]
+                    keywords[empty[key]] = (old_key, old_value + '\n' + token)
+        if stack:
+            raise HsdSyntaxError(self.filepath, 'missing } for ' + stack[-1])
+        return keywords
+
+    def include(self, text):
+        """Return the content of a <<< "file" inclusion, if text is one.
+
+        The path is relative to the directory of the hsd file.
+
+        """
+        if not text.startswith('<<<'):
+            return text
+        path = text[3:].strip().strip('"\'')
+        with open(os.path.join(os.path.dirname(self.filepath), path)) as incf:
+            return incf.read()
+
+
+class HsdSyntaxError(Exception):
+    """Raised when the hsd file cannot be parsed.
+
+    Args:
+        filepath: the hsd file.
+        msg: what went wrong.
+
+    """
+    def __init__(self, filepath, msg):
+        super().__init__('{}: {}'.format(filepath, msg))
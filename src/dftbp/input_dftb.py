@@ -17,6 +17,9 @@ dftb+ code.
 import os
 from dftbp.dftb_data import DftbData
 from dftbp.dftb_data import DftbPreset
+from dftbp.hsd_reader import HsdReader
+from libs.io_geo import GeoIo
+from libs.kpoints import MonkhorstPack
 # from libs.geometry import Geometry as Structure
 
 # Try determining the version from git:
@@ -54,6 +57,10 @@ class InputDftb(dict):
     Adding an underscore at the end of a key will open a curly bracket in the
     hsd format.
 
+    The unit modifiers of a loaded file (Temperature [Kelvin] = 300) are kept
+    in the modifiers dictionary, not in the key: adding or changing a keyword
+    drops its modifier, since the new value is given in atomic units.
+
     Args:
         Geometry: is a geometry class defined in the libs module
         parameters_folder: absolute path to the folder containing the parameters
@@ -70,6 +77,7 @@ class InputDftb(dict):
 
     def __init__(self, Geometry, parameters_folder):
         super().__init__()
+        self.modifiers = {}
 
         default_prms = dict(
             Geometry_='GenFormat',
@@ -92,6 +100,77 @@ class InputDftb(dict):
         self.Geometry = Geometry
         self.parameters_folder = parameters_folder
         self.parameters_set = None
+        self.kpoint_length = 20.0
+
+    @classmethod
+    def from_hsd(cls, filepath, parameters_folder=None):
+        """Load an existing hsd file.
+
+        All the keywords of the file replace the default ones. The geometry
+        is read from the GenFormat block (inlined or included with <<<). The
+        properties per atom are not added again when writing: a loaded file
+        already contains them.
+
+        Args:
+            filepath: path of the hsd file.
+            parameters_folder: absolute path to the folder containing the
+                parameters (needed only if a preset is set afterwards).
+
+        """
+        reader = HsdReader(filepath)
+        keywords = reader.read()
+        values = dict(keywords)
+        if values.get('Geometry_', '').strip() != 'GenFormat':
+            raise NotImplementedError(
+                'Only the GenFormat geometry can be read from {}'.format(
+                    filepath))
+        geometry = GeoIo()
+        geometry.gen_reads(reader.include(values['Geometry_empty']), filepath)
+
+        new = cls(geometry, parameters_folder)
+        dict.clear(new)
+        for k, v in keywords:
+            new.add_keyword(k, v)
+        new.modifiers.update(reader.modifiers)
+        return new
+
+    def is_enabled(self, keyword):
+        """Return True if the logical keyword is set to Yes.
+
+        The hsd logical values are not case sensitive (Yes, yes, YES).
+
+        """
+        return str(self.get(keyword, 'No')).strip().lower() == 'yes'
+
+    def set_socket_driver(self, host=None, port=None, filename=None,
+                          maxsteps=10000000):
+        """Replace the Driver block with an i-PI socket driver.
+
+        Only the Driver block is touched: this is all that changes between
+        two jobs started from the same input.
+
+        Args:
+            host: address of the i-PI server (inet socket).
+            port: port of the i-PI server (inet socket).
+            filename: name of the unix socket. If given host and port are
+                ignored.
+            maxsteps: kept from the previous driver if it was defined.
+
+        """
+        if 'Driver_' in self.keys():
+            maxsteps = self.get('Driver_MaxSteps', maxsteps)
+            self.del_keyword('Driver_')
+        # An empty driver (Driver = {}) is read as a plain keyword
+        if 'Driver' in self.keys():
+            self.del_keyword('Driver')
+        self.add_keyword('Driver_', 'Socket')
+        self.add_keyword('Driver_Protocol', 'i-PI{}')
+        self.add_keyword('Driver_MaxSteps', maxsteps)
+        if filename is not None:
+            self.add_keyword('Driver_File', filename)
+        else:
+            self.add_keyword('Driver_Host', host)
+            self.add_keyword('Driver_Port', port)
 
     def _set_atoms_property(self):
         """Private method to retrieve the data per atom/parameters_set.
@@ -113,10 +192,8 @@ class InputDftb(dict):
                              data.find_data_per_atom(atype,
                                                      'max_angular_momentum'))
 
-        isThirdOrder = 'Hamiltonian_ThirdOrder' in self and \
-            self['Hamiltonian_ThirdOrder'] == 'Yes'
-        isThirdOrderFull = 'Hamiltonian_ThirdOrderFull' in self and \
-            self['Hamiltonian_ThirdOrderFull'] == 'Yes'
+        isThirdOrder = self.is_enabled('Hamiltonian_ThirdOrder')
+        isThirdOrderFull = self.is_enabled('Hamiltonian_ThirdOrderFull')
         if isThirdOrder or isThirdOrderFull:
             for atype in Geometry.specienames:
                 self.add_keyword('Hamiltonian_HubbardDerivs_{}'.format(atype),
@@ -133,7 +210,8 @@ class InputDftb(dict):
         brackets.
 
         """
-        self._set_atoms_property()
+        if self.parameters_set is not None:
+            self._set_atoms_property()
 
         input_str = ''
         previous_key = 'dummy_'
@@ -145,19 +223,69 @@ class InputDftb(dict):
                     range(previous_depth - current_depth)):
                 input_str += (3 * (1 + my_backsclash) * myspace + '} \n')
             input_str += (3 * current_depth * myspace)
+            modifier = ''
+            if key in self.modifiers:
+                modifier = ' ' + self.modifiers[key]
             if key.endswith('_'):
-                input_str += (key.rstrip('_').rsplit('_')[-1] +
+                input_str += (key.rstrip('_').rsplit('_')[-1] + modifier +
                               ' = ' + str(value) + '{ \n')
             elif key.count('_empty') == 1:
                 input_str += (str(value) + ' \n')
             else:
-                input_str += (key.rsplit('_')[-1] + ' = ' + str(value) + ' \n')
+                input_str += (key.rsplit('_')[-1] + modifier + ' = ' +
+                              str(value) + ' \n')
             previous_key = key
         current_depth = key.rstrip('_').count('_')
         for my_backsclash in reversed(range(current_depth)):
             input_str += (3 * my_backsclash * myspace + '} \n')
         return input_str
 
+    def write_variants(self, variants):
+        """Render the input once and specialise it for a list of variants.
+
+        The keywords that change between the variants are replaced by a
+        placeholder, the whole input is rendered only once and then each
+        variant is obtained substituting the placeholders with its own values.
+        All the variants have to define the same keywords.
+
+        Args:
+            variants: list of dictionaries. Each dictionary contains the
+                keywords in the *string* format (see class docstring) with the
+                value they should assume in that variant.
+
+        Returns:
+            A list with one hsd string per variant.
+
+        """
+        if not variants:
+            return []
+        keys = sorted(variants[0].keys())
+        placeholder = '@@{}@@'.format
+
+        originals = {}
+        modifiers = dict(self.modifiers)
+        for key in keys:
+            if key in self.keys():
+                originals[key] = self[key]
+            self.add_keyword(key, placeholder(key))
+        template = self.write()
+        for key in keys:
+            if key in originals:
+                super().__setitem__(key, originals[key])
+            else:
+                super().__delitem__(key)
+        self.modifiers = modifiers
+
+        rendered = []
+        for variant in variants:
+            if sorted(variant.keys()) != keys:
+                raise ValueError('All the variants must define the same keywords')
+            msg = template
+            for key in keys:
+                msg = msg.replace(placeholder(key), str(variant[key]))
+            rendered.append(msg)
+        return rendered
+
     def _make_string_keyword(self, keyword, parents):
         """Convert a keyword with his parents in a *string formatted* keyword.
 
@@ -205,6 +333,7 @@ class InputDftb(dict):
                 super().__setitem__(keyw, '')
 
         super().__setitem__(key, value)
+        self.modifiers.pop(key, None)
 
     def del_keyword(self, keyword, *parents):
         """This method is used to delete keyword from the container.
@@ -226,7 +355,14 @@ class InputDftb(dict):
 
         if key not in self.keys(): raise NotExistingKeyword(key)
 
-        super().__delattr__(key)
+        # Deleting a block deletes all its children too
+        if key.endswith('_'):
+            for k in [k for k in self.keys() if k.startswith(key)]:
+                super().__delitem__(k)
+                self.modifiers.pop(k, None)
+        else:
+            super().__delitem__(key)
+            self.modifiers.pop(key, None)
 
     def change_keyword(self, keyword, value, *parents):
         """This method is used to change a keyword's value in the container.
@@ -248,9 +384,10 @@ class InputDftb(dict):
         """
         key = self._make_string_keyword(keyword, parents)
 
-        if key in self.items(): raise NotExistingKeyword(key, value)
+        if key not in self.keys(): raise NotExistingKeyword(key, value)
 
-        super().__setitem__(keyword, value)
+        super().__setitem__(key, value)
+        self.modifiers.pop(key, None)
 
     def __setitem__(self, *args, **kwargs):
         """Just turning off the usual method to add data to a dictionary.
@@ -269,12 +406,33 @@ class InputDftb(dict):
         raise AlternativeMethod('__delitem__', 'del_keyword')
 
     def set_preset(self, preset):
+        """Add the keywords of a preset defined in the dftb_data module.
+
+        The k-points of the preset are never used: a cluster is computed at
+        the Gamma point without any Ewald sum or image cell, so the
+        KPointsAndWeights block is simply dropped, while for periodic
+        geometries a Monkhorst-Pack grid is derived from the lattice vectors
+        (see kpoint_length and the MonkhorstPack class).
+
+        Args:
+            preset: one of the names of the presets in DftbPreset.
+
+        """
         param = DftbPreset().get(preset)
         self.parameters_set = param.pop('_parameters_set')
         self.skdir = param.pop('_sk_directory')
         for k, v in param.items():
+            if k.startswith('Hamiltonian_KPointsAndWeights'):
+                continue
             self.add_keyword(k, v)
 
+        if self.Geometry.periodic:
+            kpoints = MonkhorstPack(self.Geometry, self.kpoint_length)
+            self.add_keyword('Hamiltonian_KPointsAndWeights_',
+                             'SupercellFolding')
+            self.add_keyword('Hamiltonian_KPointsAndWeights_empty',
+                             kpoints.supercell_folding())
+
         self.add_keyword('Hamiltonian_SlaterKosterFiles_Prefix',
                          os.path.join(self.parameters_folder, self.skdir) + '/')
 
@@ -341,3 +499,28 @@ class AlternativeMethod(Exception):
         msg += 'Try with {} instead!\n'.format(touse)
         sys.stderr.write(msg)
         sys.exit(1)
+
+
+if __name__ == '__main__':
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmpdir:
+        hsd = os.path.join(tmpdir, 'dftb_in.hsd')
+        with open(hsd, 'w') as hsdf:
+            hsdf.write('Geometry = GenFormat {\n'
+                       '  2 C\n  H\n'
+                       '  1 1 0.0 0.0 0.0\n  2 1 0.0 0.0 0.74\n}\n'
+                       'Driver = {}\n'
+                       'Hamiltonian = DFTB {\n  SCC = Yes\n'
+                       '  Filling = Fermi {\n'
+                       '    Temperature [Kelvin] = 300\n  }\n}\n')
+        dftb = InputDftb.from_hsd(hsd)
+        dftb.set_socket_driver(filename='test')
+        text = dftb.write()
+        assert 'Driver' not in dftb.keys(), text
+        assert text.count('Driver =') == 1, text
+        assert 'Temperature [Kelvin] = 300' in text, text
+        dftb.change_keyword('Hamiltonian_Filling_Temperature', 0.001)
+        text = dftb.write()
+        assert text.count('Temperature') == 1, text
+        assert 'Temperature = 0.001' in text, text
+        print(text)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: replica_inputs
+# Creation: Oct 19, 2026
+#
+
+"""Generate one dftb+ input per REM replica.
+
+All the replicas of a REM share the same dftb+ input apart from a few keywords
+that depend on the temperature of the replica (electronic temperature, SCC
+tolerance). This module takes a fully configured InputDftb, renders it once
+and writes one variant per replica.
+
+"""
+
+from dftbp.dftb_data import KELVIN_TO_HARTREE
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+class ReplicaInputs(object):
+    """Per-replica dftb+ inputs built from one shared InputDftb.
+
+    The electronic temperature of each replica is set to the temperature of
+    the replica itself. The SCC tolerance is relaxed linearly with the ratio
+    between the replica temperature and the lowest one, up to
+    max_tolerance_factor times the base tolerance and never above
+    max_tolerance: the hot replicas, whose SCC converges poorly, do not waste
+    hundreds of iterations on a precision that is hidden by the thermal noise
+    anyway. A base tolerance already at max_tolerance (as the one chosen for
+    the large systems) is not relaxed at all.
+
+    Args:
+        dftb_input: the InputDftb used as template (preset already set).
+        temperatures: list of the replica temperatures in Kelvin.
+        scc_tolerance: SCC tolerance used for the coldest replica. If None
+            the SCCTolerance of dftb_input is used (1.0e-5 if not set).
+        max_tolerance_factor: largest relaxation of the SCC tolerance.
+        max_tolerance: loosest SCC tolerance given to a replica. If the base
+            tolerance is looser it is used as such.
+        filename: printf-like pattern for the file of each replica. The
+            pattern is shared with the runMany script.
+
+    """
+    def __init__(self, dftb_input, temperatures, scc_tolerance=None,
+                 max_tolerance_factor=10.0, max_tolerance=1.0e-4,
+                 filename='dftb_in-REM-%03i.hsd'):
+        self.dftb_input = dftb_input
+        self.temperatures = [float(t) for t in temperatures]
+        if scc_tolerance is None:
+            scc_tolerance = dftb_input.get('Hamiltonian_SCCTolerance', 1.0e-5)
+        self.scc_tolerance = float(scc_tolerance)
+        self.max_tolerance_factor = max_tolerance_factor
+        self.max_tolerance = max(float(max_tolerance), self.scc_tolerance)
+        self.filename = filename
+
+    def settings(self, temperature):
+        """Return the keywords that depend on the replica temperature.
+
+        Args:
+            temperature: replica temperature in Kelvin.
+
+        """
+        settings = dict()
+        if 'Hamiltonian_Filling_' in self.dftb_input.keys():
+            settings['Hamiltonian_Filling_Temperature'] = \
+                temperature * KELVIN_TO_HARTREE
+        if self.dftb_input.is_enabled('Hamiltonian_SCC'):
+            factor = temperature / min(self.temperatures)
+            factor = min(max(factor, 1.0), self.max_tolerance_factor)
+            settings['Hamiltonian_SCCTolerance'] = '{:.3E}'.format(
+                min(self.scc_tolerance * factor, self.max_tolerance))
+        return settings
+
+    def write(self):
+        """Write one input file per replica and return the file names.
+
+        The replicas are numbered starting from 1 as the REM-xxx directories
+        created by the runMany script.
+
+        """
+        variants = [self.settings(t) for t in self.temperatures]
+        filenames = []
+        for i, msg in enumerate(self.dftb_input.write_variants(variants)):
+            filename = self.filename % (i + 1)
+            with open(filename, 'w') as hsdf:
+                hsdf.write(msg)
+            filenames.append(filename)
+        return filenames
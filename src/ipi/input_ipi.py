@@ -112,6 +112,7 @@ class InputTemplate(object):
             timeout='./ffsocket/timeout',
             # SYSTEM
             xyzfile='./system/initialize/file',
+            cell='./system/initialize/cell',
             initial_temperature='./system/initialize/velocities',
             temperature='./system/ensemble/temperature',
             timestep='./system/ensemble/timestep',
@@ -221,6 +222,8 @@ class InputIpi(InputTemplate):
         self._options = dict(
             rem='no'
         )
+        self.temp_list = []
+        self.bias_policy = dict(policy='constant')
 
     def set(self, key, value):
         """Set (add/edit) value in the _options dictionary in a safe way.
@@ -256,6 +259,7 @@ class InputIpi(InputTemplate):
                     'You miss some REM keyword'))
 
             temp_list = self._compute_rem_temperature(maxtemp, mintemp, nreps, steep)
+            self.temp_list = temp_list
 
             rem = etree.SubElement(self.input_xml, 'paratemp')
             rtemp = etree.SubElement(rem, 'temp_list')
@@ -268,17 +272,10 @@ class InputIpi(InputTemplate):
             stride.text = ' {:5d} '.format(rstride)
             self._set_attrib('system', 'copies', str(nreps))
             if self._options['bias']:
-                bias_list = []
-                for x in temp_list:
-                    # if x < 1800 and x > 1500:
-                    #     bias_list.append(0.5)
-                    # elif x > 1500:
-                    #     bias_list.append(1)
-                    # else:
-                    #     bias_list.append(0)
-                    bias_list.append(1)
+                bias_list = bias_scaling(temp_list, **self.bias_policy)
                 rbias = etree.SubElement(rem, 'bias_list')
-                rbias_list = ', '.join([str(x) for x in bias_list])
+                rbias_list = ', '.join(['{:.6g}'.format(x) for x in bias_list])
+                print('BIASLIST:' + '[' + rbias_list + ']')
                 rbias.text = '[' + rbias_list + ']'
 
     def _set_bias(self):
@@ -345,6 +342,10 @@ class InputIpi(InputTemplate):
         """Create the final input and return it as a string.
 
         """
+        # The scaling of the bias along the temperatures (see bias_scaling)
+        for key in ('policy', 't0', 't1', 'width'):
+            if 'bias_' + key in self._options:
+                self.bias_policy[key] = self._options.pop('bias_' + key)
         if 'rem' in self._options:
             self._set_rem()
         if self._options['bias']:
@@ -363,6 +364,16 @@ class InputIpi(InputTemplate):
                     else:
                         for inst in self.input_xml.findall('./ffsocket'):
                             inst.set('mode', 'inet')
+                elif k == 'pbc':
+                    # A cluster is sent to the clients without folding it
+                    # in the cell
+                    for inst in self.input_xml.findall('./ffsocket'):
+                        inst.set('pbc', 'true' if v == 'yes' else 'false')
+                elif k == 'total_time':
+                    # Soft walltime: i-PI stops and writes its RESTART file
+                    tag = etree.Element('total_time')
+                    tag.text = ' {} '.format(v)
+                    self.input_xml.insert(1, tag)
                 elif k == 'title' or k == 'bias':
                     continue
                 else:
@@ -375,6 +386,49 @@ class InputIpi(InputTemplate):
         return etree.tostring(self.input_xml, method='xml', encoding='us-ascii')
 
 
+def bias_scaling(temps, policy='constant', t0=None, t1=None, width=None):
+    """Return the scaling of the bias for each temperature.
+
+    The cold replicas do not need the bias: the policies switch it on along
+    the temperatures.
+
+    constant
+        1 everywhere.
+    step
+        0 below t0 and 1 from t0; with t1, 0.5 from t0 and 1 from t1.
+    linear
+        0 up to t0, then growing linearly up to 1 at t1.
+    sigmoid
+        1 / (1 + exp(-(T - t0) / width)).
+
+    Args:
+        temps: the temperatures of the replicas.
+        policy: one of the above.
+        t0, t1: temperatures (K) of the policy.
+        width: width (K) of the sigmoid.
+
+    """
+    temps = np.asarray(temps, dtype=float)
+    if policy == 'constant':
+        return np.ones_like(temps)
+    if t0 is None:
+        raise ValueError('The bias policy {} needs t0'.format(policy))
+    if policy == 'step':
+        scaling = (temps >= t0).astype(float)
+        if t1 is not None:
+            scaling = 0.5 * scaling + 0.5 * (temps >= t1)
+        return scaling
+    if policy == 'linear':
+        if t1 is None or t1 <= t0:
+            raise ValueError('The linear bias policy needs t1 > t0')
+        return np.clip((temps - t0) / (t1 - t0), 0.0, 1.0)
+    if policy == 'sigmoid':
+        if width is None or width <= 0:
+            raise ValueError('The sigmoid bias policy needs a positive width')
+        return 1.0 / (1.0 + np.exp(-(temps - t0) / width))
+    raise ValueError('Unknown bias policy: {}'.format(policy))
+
+
 class remTempEstimator(list):
 
     def __init__(self, tmin, tmax, N, steep):
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: mock_clients
+# Creation: Oct 19, 2026
+#
+
+"""A pool of fake dftb+ clients, to load-test the socket settings.
+
+The clients read the Driver block of the dftb+ input (Socket with Host and
+Port, or File for the unix sockets), connect to the server all at the same
+time (asyncio) and answer each POSDATA with synthetic forces: a harmonic
+spring on the first positions received. The computation is replaced by a
+sleep of delay seconds with a gaussian jitter, so that a client costs nothing
+but behaves, for the server, as a dftb+ of the same speed.
+
+Each client records how long it waited for a request (idle) and how long it
+took to answer (busy). With --xml the pool also runs the mock i-PI server
+(see mock_server.py) in the same process, once for each number of clients of
+--clients: the rows of the summary give the queueing and the throughput as the
+number of clients grows, e.g. to choose --slots and the number of replicas::
+
+    $ python3 mock_clients.py dftb_in.hsd --xml ipi_input.xml \\
+          --host 127.0.0.1 --clients 1,2,4,8,16 --delay 0.05 --jitter 0.01
+
+Without --xml the clients connect to a server already running.
+
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ipi import protocol
+from ipi.mock_server import FfsocketSettings, SystemSettings, MockServer
+from dftbp.hsd_reader import HsdReader
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+class DriverSettings(object):
+    """The socket of the Driver block of a dftb+ input.
+
+    Args:
+        mode: inet or unix.
+        host: host of the inet socket.
+        port: port of the inet socket.
+        path: path of the unix socket.
+
+    """
+    def __init__(self, mode='inet', host='localhost', port=None, path=None):
+        self.mode = mode
+        self.host = host
+        self.port = port
+        self.path = path
+
+    @classmethod
+    def from_hsd(cls, hsd):
+        """Read the Driver block of a dftb+ input.
+
+        dftb+ opens the unix socket File as /tmp/ipi_File, as i-PI does.
+
+        """
+        keywords = dict(HsdReader(hsd).read())
+        if keywords.get('Driver_') != 'Socket':
+            raise ValueError('{}: the driver is not a socket'.format(hsd))
+        if 'Driver_File' in keywords:
+            return cls(mode='unix', host=None, path=protocol.unix_path(
+                keywords['Driver_File'].strip('"\'')))
+        return cls(host=keywords['Driver_Host'].strip('"\''),
+                   port=int(keywords['Driver_Port']))
+
+    def where(self):
+        if self.mode == 'unix':
+            return self.path
+        return '{}:{}'.format(self.host, self.port)
+
+
+class MockClient(object):
+    """A client answering with synthetic forces after a fake computation.
+
+    Args:
+        settings: DriverSettings.
+        delay: mean seconds of a force computation.
+        jitter: standard deviation (s) of the computation time.
+        spring: force constant (Hartree/bohr^2) of the synthetic forces.
+        rng: random.Random used for the jitter.
+
+    """
+    def __init__(self, settings, delay=0.0, jitter=0.0, spring=0.01,
+                 rng=None):
+        self.settings = settings
+        self.delay = delay
+        self.jitter = jitter
+        self.spring = spring
+        self.rng = rng or random.Random()
+        self.reference = None
+        self.idle = []
+        self.busy = []
+
+    async def _connect(self, retries=50):
+        """Connect, waiting for a server that is still starting."""
+        for _ in range(retries):
+            try:
+                if self.settings.mode == 'unix':
+                    return await asyncio.open_unix_connection(
+                        self.settings.path)
+                return await asyncio.open_connection(self.settings.host,
+                                                     self.settings.port)
+            except OSError:
+                await asyncio.sleep(0.1)
+        raise ConnectionError('Cannot connect to ' + self.settings.where())
+
+    def _forces(self, positions):
+        if self.reference is None:
+            self.reference = positions.copy()
+        displacement = positions - self.reference
+        energy = 0.5 * self.spring * float((displacement ** 2).sum())
+        return energy, -self.spring * displacement
+
+    async def run(self):
+        """Answer the server until EXIT or the end of the connection."""
+        reader, writer = await self._connect()
+        initialised = False
+        answer = None
+        waiting = time.perf_counter()
+        try:
+            while True:
+                word = await protocol.read_header(reader)
+                if word == 'STATUS':
+                    if answer is not None:
+                        writer.write(protocol.header('HAVEDATA'))
+                    elif initialised:
+                        writer.write(protocol.header('READY'))
+                    else:
+                        writer.write(protocol.header('NEEDINIT'))
+                elif word == 'INIT':
+                    await protocol.read_init(reader)
+                    initialised = True
+                elif word == 'POSDATA':
+                    start = time.perf_counter()
+                    self.idle.append(start - waiting)
+                    _, positions = await protocol.read_positions(reader)
+                    answer = self._forces(positions)
+                    await asyncio.sleep(max(0.0, self.rng.gauss(
+                        self.delay, self.jitter)))
+                    self.busy.append(time.perf_counter() - start)
+                elif word == 'GETFORCE':
+                    writer.write(protocol.forces_message(*answer))
+                    answer = None
+                    waiting = time.perf_counter()
+                else:
+                    # EXIT, or the server is gone
+                    break
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+class ClientPool(object):
+    """Many MockClient connected at the same time.
+
+    Args:
+        settings: DriverSettings.
+        nclients: number of clients.
+        delay, jitter, spring: see MockClient.
+        seed: seed of the jitter, for reproducible runs.
+
+    """
+    def __init__(self, settings, nclients, delay=0.0, jitter=0.0,
+                 spring=0.01, seed=None):
+        rng = random.Random(seed)
+        self.clients = [MockClient(settings, delay, jitter, spring,
+                                   random.Random(rng.random()))
+                        for _ in range(int(nclients))]
+        self.failed = 0
+
+    async def run(self):
+        """Run the clients; the ones that cannot connect are counted."""
+        results = await asyncio.gather(
+            *[client.run() for client in self.clients],
+            return_exceptions=True)
+        self.failed = sum(isinstance(r, ConnectionError) for r in results)
+        for result in results:
+            if isinstance(result, Exception) and \
+                    not isinstance(result, ConnectionError):
+                raise result
+
+    def summary(self):
+        idle = sum(sum(c.idle) for c in self.clients)
+        busy = sum(sum(c.busy) for c in self.clients)
+        return dict(clients=len(self.clients), failed=self.failed,
+                    answered=sum(len(c.busy) for c in self.clients),
+                    busy_fraction=busy / (busy + idle)
+                    if busy + idle > 0 else None)
+
+
+async def _sweep_point(server, pool):
+    serving = asyncio.ensure_future(server.serve())
+    await asyncio.gather(serving, pool.run())
+
+
+def sweep(driver, ffsocket, system, counts, steps=10, copies=None, delay=0.0,
+          jitter=0.0, bind=None, seed=None):
+    """Run the mock server with each number of clients in counts.
+
+    Returns:
+        The list of the summaries, the ones of the server with the
+        clients and busy_fraction of the pool added.
+
+    """
+    positions = system.positions()
+    summaries = []
+    for nclients in counts:
+        server = MockServer(ffsocket, positions, system.cell,
+                            copies=copies or system.copies, steps=steps,
+                            bind=bind, verbose=False)
+        pool = ClientPool(driver, nclients, delay, jitter, seed=seed)
+        asyncio.run(_sweep_point(server, pool))
+        summary = server.summary()
+        summary.update(pool.summary())
+        summary.update(delay=delay, jitter=jitter)
+        summaries.append(summary)
+    return summaries
+
+
+def report(summaries):
+    """Return the sweep as a printable table (times in ms)."""
+    row = '{:>8s} {:>10s} {:>10s} {:>10s} {:>10s} {:>10s} {:>8s}\n'
+    msg = row.format('clients', 'req/s', 'step', 'queue', 'queue p95',
+                     'exchange', 'busy')
+    for summary in summaries:
+        msg += row.format(
+            str(summary['clients']),
+            '{:.1f}'.format(summary['requests_per_s'] or 0.0),
+            '{:.2f}'.format(1e3 * summary['step'].get('mean', 0.0)),
+            '{:.2f}'.format(1e3 * summary['queue'].get('mean', 0.0)),
+            '{:.2f}'.format(1e3 * summary['queue'].get('p95', 0.0)),
+            '{:.2f}'.format(1e3 * summary['exchange'].get('mean', 0.0)),
+            '{:.0%}'.format(summary['busy_fraction'] or 0.0))
+    return msg
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        description='Fake dftb+ clients answering with synthetic forces.')
+    parser.add_argument('hsd', help='The dftb+ input with the Driver block')
+    parser.add_argument('--clients', default='1',
+                        help='Number of clients, or a comma separated list '
+                             'of numbers to sweep (with --xml)')
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help='Mean seconds of a force computation')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Standard deviation (s) of the computation time')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--host', default=None,
+                        help='Connect to (and, with --xml, listen on) this '
+                             'host instead of the one of the Driver block')
+    parser.add_argument('--xml', default=None,
+                        help='Run the mock i-PI server of this input in the '
+                             'same process')
+    parser.add_argument('--name', default=None,
+                        help='The ffsocket of the i-PI input (with --xml)')
+    parser.add_argument('--steps', type=int, default=10,
+                        help='Steps run by the mock server (with --xml)')
+    parser.add_argument('--copies', type=int, default=None,
+                        help='Requests per step (with --xml)')
+    parser.add_argument('--json', default=None,
+                        help='Append the summaries to this file (JSON lines)')
+    return parser.parse_args()
+
+
+def main():
+    args = _parser()
+    driver = DriverSettings.from_hsd(args.hsd)
+    if args.host is not None and driver.mode == 'inet':
+        driver.host = args.host
+    counts = [int(n) for n in args.clients.split(',')]
+    if args.xml is None:
+        if len(counts) > 1:
+            sys.stderr.write('A sweep on the number of clients needs --xml\n')
+            sys.exit(1)
+        pool = ClientPool(driver, counts[0], args.delay, args.jitter,
+                          seed=args.seed)
+        asyncio.run(pool.run())
+        summaries = [pool.summary()]
+        sys.stdout.write('{} forces from {} clients, busy {:.0%}\n'.format(
+            summaries[0]['answered'], summaries[0]['clients'],
+            summaries[0]['busy_fraction'] or 0.0))
+    else:
+        ffsocket = FfsocketSettings.from_xml(args.xml, args.name)
+        summaries = sweep(driver, ffsocket, SystemSettings(args.xml), counts,
+                          steps=args.steps,
+                          copies=args.copies, delay=args.delay,
+                          jitter=args.jitter, bind=args.host,
+                          seed=args.seed)
+        sys.stdout.write(report(summaries))
+    if args.json is not None:
+        with open(args.json, 'a') as jsonf:
+            for summary in summaries:
+                jsonf.write(json.dumps(summary) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: mock_server
+# Creation: Oct 19, 2026
+#
+
+"""A stand-in for i-PI, to try the generated inputs without installing it.
+
+The server reads an ffsocket (address, port, mode, slots, timeout) and the
+system (copies, cell and initial geometry) from the XML written by InputIpi,
+opens the same socket and drives the clients with the i-PI protocol (see
+protocol.py). Each step sends one force request per copy of the system, all
+of them queued together, and waits for all the forces as i-PI does; the
+requests of a client that disconnects are sent to another one.
+
+For every request the time spent in the queue and the time of the exchange
+(POSDATA to FORCEREADY) are recorded; the summary gives the latencies and
+the throughput.
+
+Example:
+    $ python3 mock_server.py ipi_input.xml --steps 100 --bind 127.0.0.1
+    $ python3 mock_server.py ipi_input.xml --name plumed_bias --json bench.json
+
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import xml.etree.ElementTree as etree
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ipi import protocol
+from libs.io_geo import GeoIo
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+# Box used when the XML does not give an abc cell (Angstrom)
+DEFAULT_BOX = 100.0
+
+
+class FfsocketSettings(object):
+    """The settings of an ffsocket of the i-PI input.
+
+    Args:
+        name: name of the ffsocket.
+        mode: inet or unix.
+        address: host (inet) or name of the socket (unix).
+        port: port of the inet socket.
+        slots: clients expected.
+        timeout: seconds before a silent client is considered dead.
+
+    """
+    def __init__(self, name='dftbuff', mode='inet', address='localhost',
+                 port=None, slots=1, timeout=60.0):
+        self.name = name
+        self.mode = mode
+        self.address = address
+        self.port = port
+        self.slots = slots
+        self.timeout = timeout
+
+    @classmethod
+    def from_xml(cls, xml, name=None):
+        """Read the ffsocket name (the first one if None) of an i-PI input."""
+        root = etree.parse(xml).getroot()
+        sockets = root.findall('ffsocket')
+        if name is not None:
+            sockets = [s for s in sockets if s.get('name') == name]
+        if not sockets:
+            raise ValueError('No ffsocket {}in {}'.format(
+                '' if name is None else name + ' ', xml))
+        sock = sockets[0]
+        port = sock.findtext('port')
+        return cls(name=sock.get('name'),
+                   mode=sock.get('mode', 'inet'),
+                   address=sock.findtext('address').strip(),
+                   port=None if port is None else int(port),
+                   slots=int(sock.findtext('slots', '1')),
+                   timeout=float(sock.findtext('timeout', '60')))
+
+
+class SystemSettings(object):
+    """Copies, cell and initial geometry of the system of the i-PI input.
+
+    The geometry file is relative to the directory of the XML.
+
+    """
+    def __init__(self, xml):
+        root = etree.parse(xml).getroot()
+        system = root.find('system')
+        self.copies = int(system.get('copies', 1))
+        initialize = system.find('initialize')
+        self.geometry = os.path.join(os.path.dirname(os.path.abspath(xml)),
+                                     initialize.findtext('file').strip())
+        self.cell = np.eye(3) * DEFAULT_BOX
+        cell = initialize.find('cell')
+        if cell is not None and cell.get('mode') == 'abc':
+            abc = cell.text.strip().strip('[]').split(',')
+            self.cell = np.diag([float(v) for v in abc])
+
+    def positions(self):
+        """Return the initial positions (Angstrom)."""
+        geo = GeoIo()
+        geo.xyz_read(self.geometry)
+        return np.asarray(geo.coords, dtype=float)
+
+
+class MockServer(object):
+    """Serve the force requests of a simulation to the connected clients.
+
+    The steps start when the first client connects.
+
+    Args:
+        settings: FfsocketSettings.
+        positions: positions (Angstrom) sent to the clients.
+        cell: cell (Angstrom), one lattice vector per row.
+        copies: force requests for each step.
+        steps: steps of the simulation.
+        bind: host to listen on (inet sockets), the address of the settings
+            if None.
+        verbose: print where the server listens.
+
+    """
+    def __init__(self, settings, positions, cell, copies=1, steps=10,
+                 bind=None, verbose=True):
+        self.settings = settings
+        self.positions = np.asarray(positions) / protocol.BOHR
+        self.cell = np.asarray(cell) / protocol.BOHR
+        self.copies = int(copies)
+        self.steps = int(steps)
+        self.bind = bind or settings.address
+        self.verbose = verbose
+        # The positions do not change: the message is built once
+        self.message = protocol.posdata_message(self.cell, self.positions)
+        self.queue = None
+        self.clients = 0
+        self.connected = None
+        # One (copy, seconds in the queue, seconds of the exchange) per
+        # request
+        self.records = []
+        self.step_times = []
+        self.bytes = 0
+        self.started = None
+        self.stopped = None
+
+    async def _request(self, reader, writer, copy):
+        """Exchange positions and forces for one request."""
+        timeout = self.settings.timeout
+        message = self.message
+        while True:
+            writer.write(protocol.header('STATUS'))
+            await writer.drain()
+            status = await asyncio.wait_for(protocol.read_header(reader),
+                                            timeout)
+            if status == 'NEEDINIT':
+                writer.write(protocol.init_message(copy))
+            elif status == 'READY':
+                break
+            else:
+                raise ConnectionError('Unexpected status: {}'.format(status))
+        writer.write(message)
+        writer.write(protocol.header('STATUS'))
+        await writer.drain()
+        if await asyncio.wait_for(protocol.read_header(reader),
+                                  timeout) != 'HAVEDATA':
+            raise ConnectionError('The client has no forces')
+        writer.write(protocol.header('GETFORCE'))
+        await writer.drain()
+        if await asyncio.wait_for(protocol.read_header(reader),
+                                  timeout) != 'FORCEREADY':
+            raise ConnectionError('The client did not send the forces')
+        _, forces, _, extra = await asyncio.wait_for(
+            protocol.read_forces(reader), timeout)
+        if forces.shape != self.positions.shape:
+            raise ConnectionError('Wrong number of forces')
+        # POSDATA and FORCEREADY messages (the STATUS exchanges are small)
+        self.bytes += len(message) + protocol.HEADER_LEN + 8 + 4 + \
+            forces.nbytes + 72 + 4 + len(extra)
+
+    async def _client(self, reader, writer):
+        self.clients += 1
+        self.connected.set()
+        if self.stopped is not None:
+            # Too late, the simulation is over
+            self.queue.put_nowait(None)
+        try:
+            while True:
+                request = await self.queue.get()
+                if request is None:
+                    writer.write(protocol.header('EXIT'))
+                    await writer.drain()
+                    self.queue.task_done()
+                    break
+                copy, queued = request
+                start = time.perf_counter()
+                try:
+                    await self._request(reader, writer, copy)
+                except (ConnectionError, EOFError, asyncio.TimeoutError):
+                    # The client is gone: another one takes its request
+                    self.queue.put_nowait(request)
+                    self.queue.task_done()
+                    break
+                end = time.perf_counter()
+                self.records.append((copy, start - queued, end - start))
+                self.queue.task_done()
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def _open(self):
+        if self.settings.mode == 'unix':
+            path = protocol.unix_path(self.settings.address)
+            if os.path.exists(path):
+                os.remove(path)
+            return await asyncio.start_unix_server(self._client, path=path)
+        return await asyncio.start_server(self._client, host=self.bind,
+                                          port=self.settings.port)
+
+    async def serve(self):
+        """Run the steps, then send EXIT to the connected clients."""
+        self.queue = asyncio.Queue()
+        self.connected = asyncio.Event()
+        server = await self._open()
+        if self.verbose:
+            sys.stdout.write('Mock i-PI listening on {}, {} steps of {} '
+                             'requests\n'.format(self.where(), self.steps,
+                                                 self.copies))
+            sys.stdout.flush()
+        # The clock starts with the first client, as the simulation does
+        await self.connected.wait()
+        self.started = time.perf_counter()
+        for _ in range(self.steps):
+            start = time.perf_counter()
+            for copy in range(self.copies):
+                self.queue.put_nowait((copy, time.perf_counter()))
+            await self.queue.join()
+            self.step_times.append(time.perf_counter() - start)
+        self.stopped = time.perf_counter()
+        for _ in range(self.clients):
+            self.queue.put_nowait(None)
+        await self.queue.join()
+        server.close()
+        await server.wait_closed()
+        if self.settings.mode == 'unix':
+            os.remove(protocol.unix_path(self.settings.address))
+
+    def where(self):
+        if self.settings.mode == 'unix':
+            return protocol.unix_path(self.settings.address)
+        return '{}:{}'.format(self.bind, self.settings.port)
+
+    def summary(self):
+        """Return the statistics of the run as a dictionary (times in s)."""
+        queued = np.array([r[1] for r in self.records])
+        exchange = np.array([r[2] for r in self.records])
+        elapsed = (self.stopped or time.perf_counter()) - \
+            (self.started or time.perf_counter())
+
+        def stats(values):
+            if not len(values):
+                return {}
+            return dict(mean=float(values.mean()),
+                        p50=float(np.percentile(values, 50)),
+                        p95=float(np.percentile(values, 95)),
+                        max=float(values.max()))
+        return dict(socket=self.where(), mode=self.settings.mode,
+                    natom=len(self.positions), copies=self.copies,
+                    steps=len(self.step_times), requests=len(self.records),
+                    elapsed=elapsed,
+                    requests_per_s=len(self.records) / elapsed
+                    if elapsed > 0 else None,
+                    mb_per_s=self.bytes / 2.0 ** 20 / elapsed
+                    if elapsed > 0 else None,
+                    queue=stats(queued), exchange=stats(exchange),
+                    step=stats(np.array(self.step_times)))
+
+    def report(self):
+        """Return the summary as a printable string."""
+        summary = self.summary()
+        msg = '{} requests ({} steps x {} copies, {} atoms) in {:.3f} s\n'.format(
+            summary['requests'], summary['steps'], summary['copies'],
+            summary['natom'], summary['elapsed'])
+        if summary['requests_per_s'] is not None:
+            msg += 'Throughput: {:.1f} requests/s, {:.2f} MB/s\n'.format(
+                summary['requests_per_s'], summary['mb_per_s'])
+        row = '  {:10s} {:>12s} {:>12s} {:>12s} {:>12s}\n'
+        msg += row.format('ms', 'mean', 'p50', 'p95', 'max')
+        for key in ('queue', 'exchange', 'step'):
+            if summary[key]:
+                msg += row.format(key, *['{:.3f}'.format(1e3 * summary[key][s])
+                                         for s in ('mean', 'p50', 'p95',
+                                                   'max')])
+        return msg
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        description='Serve the force requests of an i-PI input to the '
+                    'clients, recording latency and throughput.')
+    parser.add_argument('xml', help='The i-PI input')
+    parser.add_argument('--name', default=None,
+                        help='The ffsocket to open, the first one if missing')
+    parser.add_argument('--steps', type=int, default=10)
+    parser.add_argument('--copies', type=int, default=None,
+                        help='Requests per step, the copies of the system if '
+                             'missing')
+    parser.add_argument('--geometry', default=None,
+                        help='xyz file with the positions, the initial '
+                             'geometry of the input if missing')
+    parser.add_argument('--bind', default=None,
+                        help='Host to listen on, the address of the ffsocket '
+                             'if missing')
+    parser.add_argument('--json', default=None,
+                        help='Append the summary to this file (JSON lines)')
+    return parser.parse_args()
+
+
+def main():
+    args = _parser()
+    settings = FfsocketSettings.from_xml(args.xml, args.name)
+    system = SystemSettings(args.xml)
+    if args.geometry is not None:
+        system.geometry = args.geometry
+    server = MockServer(settings, system.positions(), system.cell,
+                        copies=args.copies or system.copies,
+                        steps=args.steps, bind=args.bind)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    sys.stdout.write(server.report())
+    if args.json is not None:
+        with open(args.json, 'a') as jsonf:
+            jsonf.write(json.dumps(server.summary()) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: protocol
+# Creation: Oct 19, 2026
+#
+
+"""The i-PI socket protocol, for asyncio streams.
+
+Each message starts with a 12 bytes header, an ASCII word padded with
+spaces. The data follow in the native byte order: 4 bytes integers and
+8 bytes floats, all in atomic units. A force call goes as::
+
+    server              client
+    STATUS        ->
+                  <-    NEEDINIT  (first call only)
+    INIT          ->              bead index, length, init string
+    STATUS        ->
+                  <-    READY
+    POSDATA       ->              cell (3x3), inverse cell (3x3), natom,
+                                  positions (natom x 3)
+    STATUS        ->
+                  <-    HAVEDATA
+    GETFORCE      ->
+                  <-    FORCEREADY energy, natom, forces (natom x 3),
+                                  virial (3x3), length, extra string
+
+The server closes the exchange with EXIT. The cells are sent transposed,
+as i-PI does (the lattice vectors are the columns of its matrix).
+
+"""
+
+import numpy as np
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+HEADER_LEN = 12
+BOHR = 0.52917721067  # Angstrom
+
+# i-PI opens the unix sockets as /tmp/ipi_ADDRESS
+UNIX_PREFIX = '/tmp/ipi_'
+
+_INT = np.dtype('i4')
+_FLOAT = np.dtype('f8')
+
+
+def unix_path(address):
+    return UNIX_PREFIX + address
+
+
+def header(word):
+    """Return the 12 bytes header of word."""
+    if len(word) > HEADER_LEN:
+        raise ValueError('Header too long: {}'.format(word))
+    return word.ljust(HEADER_LEN).encode('ascii')
+
+
+async def read_header(reader):
+    """Return the next header word, '' if the connection was closed."""
+    try:
+        data = await reader.readexactly(HEADER_LEN)
+    except EOFError:
+        return ''
+    return data.decode('ascii').strip()
+
+
+async def _read_array(reader, dtype, count):
+    data = await reader.readexactly(dtype.itemsize * count)
+    return np.frombuffer(data, dtype=dtype, count=count)
+
+
+async def _read_int(reader):
+    return int((await _read_array(reader, _INT, 1))[0])
+
+
+def _ints(*values):
+    return np.array(values, dtype=_INT).tobytes()
+
+
+def _floats(values):
+    return np.ascontiguousarray(values, dtype=_FLOAT).tobytes()
+
+
+# Server side
+
+def init_message(index=0, text=b''):
+    return header('INIT') + _ints(index, len(text)) + text
+
+
+def posdata_message(cell, positions):
+    """POSDATA message; cell and positions in bohr, one vector per row."""
+    cell = np.asarray(cell, dtype=_FLOAT)
+    positions = np.asarray(positions, dtype=_FLOAT)
+    return header('POSDATA') + _floats(cell.T) + \
+        _floats(np.linalg.inv(cell).T) + _ints(len(positions)) + \
+        _floats(positions)
+
+
+async def read_forces(reader):
+    """Read the body of FORCEREADY: return (energy, forces, virial, extra)."""
+    energy = float((await _read_array(reader, _FLOAT, 1))[0])
+    natom = await _read_int(reader)
+    forces = (await _read_array(reader, _FLOAT, 3 * natom)).reshape(natom, 3)
+    virial = (await _read_array(reader, _FLOAT, 9)).reshape(3, 3)
+    length = await _read_int(reader)
+    extra = await reader.readexactly(length)
+    return energy, forces, virial, extra
+
+
+# Client side
+
+async def read_init(reader):
+    """Read the body of INIT: return (bead index, init string)."""
+    index = await _read_int(reader)
+    length = await _read_int(reader)
+    return index, await reader.readexactly(length)
+
+
+async def read_positions(reader):
+    """Read the body of POSDATA: return (cell, positions) in bohr."""
+    cell = (await _read_array(reader, _FLOAT, 9)).reshape(3, 3).T
+    await _read_array(reader, _FLOAT, 9)
+    natom = await _read_int(reader)
+    positions = (await _read_array(reader, _FLOAT, 3 * natom)).reshape(
+        natom, 3)
+    return cell, positions
+
+
+def forces_message(energy, forces, virial=None, extra=b''):
+    forces = np.asarray(forces, dtype=_FLOAT)
+    if virial is None:
+        virial = np.zeros((3, 3))
+    return header('FORCEREADY') + _floats([energy]) + _ints(len(forces)) + \
+        _floats(forces) + _floats(virial) + _ints(len(extra)) + extra
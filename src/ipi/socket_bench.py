@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: socket_bench
+# Creation: Oct 19, 2026
+#
+
+"""Cost of the i-PI force exchange on the loopback, inet vs unix sockets.
+
+For each transport and each number of atoms, the mock i-PI server (see
+mock_server.py) exchanges positions and forces with one mock client that
+answers at once (see mock_clients.py): the time of an exchange is the
+round trip of the i-PI framing (STATUS, POSDATA, GETFORCE, FORCEREADY) and
+the size of the messages gives the bandwidth. The number of round trips is
+reduced for the large systems so that each point moves about the same
+amount of data.
+
+The results are appended to a file as JSON lines, one per point, with the
+version of inputsGen, the host and the date, to be compared across
+releases::
+
+    $ python3 socket_bench.py --output socket_bench.json
+    $ python3 socket_bench.py --natoms 10,1000 --transports unix --repeats 500
+
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ipi import protocol
+from ipi.mock_server import FfsocketSettings, MockServer
+from ipi.mock_clients import DriverSettings, MockClient
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+NATOMS = (10, 100, 1000, 10000, 100000, 1000000)
+TRANSPORTS = ('inet', 'unix')
+
+
+def _free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def _sockets(transport):
+    """Return the FfsocketSettings and the DriverSettings of a transport."""
+    if transport == 'unix':
+        name = 'inputsGen_bench_{}'.format(os.getpid())
+        return (FfsocketSettings(mode='unix', address=name),
+                DriverSettings(mode='unix', host=None,
+                               path=protocol.unix_path(name)))
+    port = _free_port()
+    return (FfsocketSettings(address='127.0.0.1', port=port),
+            DriverSettings(host='127.0.0.1', port=port))
+
+
+async def _run(server, client):
+    serving = asyncio.ensure_future(server.serve())
+    await asyncio.gather(serving, client.run())
+
+
+class SocketBench(object):
+    """Round trips of the i-PI messages for a range of system sizes.
+
+    Args:
+        natoms: numbers of atoms.
+        transports: inet and/or unix.
+        repeats: round trips of the smallest system.
+        volume: atoms moved by the round trips of each point; the larger
+            systems use volume / natom round trips (at least min_repeats).
+        min_repeats: least number of round trips of a point.
+        warmup: round trips not recorded (connection and first allocation).
+
+    """
+    def __init__(self, natoms=NATOMS, transports=TRANSPORTS, repeats=1000,
+                 volume=1.0e7, min_repeats=5, warmup=2):
+        self.natoms = [int(n) for n in natoms]
+        self.transports = list(transports)
+        self.repeats = int(repeats)
+        self.volume = volume
+        self.min_repeats = int(min_repeats)
+        self.warmup = int(warmup)
+
+    def _repeats(self, natom):
+        return max(self.min_repeats,
+                   min(self.repeats, int(self.volume / natom)))
+
+    def point(self, transport, natom, seed=0):
+        """Return the result of one transport and number of atoms."""
+        rng = np.random.RandomState(seed)
+        box = 10.0 * max(1.0, natom ** (1.0 / 3.0))
+        positions = rng.uniform(0.0, box, (natom, 3))
+        ffsocket, driver = _sockets(transport)
+        repeats = self._repeats(natom)
+        server = MockServer(ffsocket, positions, np.eye(3) * box, copies=1,
+                            steps=repeats + self.warmup, verbose=False)
+        asyncio.run(_run(server, MockClient(driver)))
+        exchange = np.array([r[2] for r in server.records[self.warmup:]])
+        # POSDATA and FORCEREADY of one round trip
+        nbytes = len(server.message) + protocol.HEADER_LEN + 8 + 4 + \
+            natom * 24 + 72 + 4
+        return dict(transport=transport, natom=natom, repeats=len(exchange),
+                    bytes=nbytes,
+                    latency_mean=float(exchange.mean()),
+                    latency_p50=float(np.percentile(exchange, 50)),
+                    latency_p95=float(np.percentile(exchange, 95)),
+                    latency_min=float(exchange.min()),
+                    mb_per_s=nbytes / 2.0 ** 20 / float(np.median(exchange)))
+
+    def run(self):
+        """Yield the results, the smallest systems first."""
+        for natom in self.natoms:
+            for transport in self.transports:
+                yield self.point(transport, natom)
+
+
+def _version():
+    if isinstance(git_v, bytes):
+        return git_v.decode().strip()
+    return git_v
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        description='Latency and bandwidth of the i-PI force exchange on '
+                    'the loopback.')
+    parser.add_argument('--natoms', default=','.join(str(n) for n in NATOMS),
+                        help='Comma separated numbers of atoms')
+    parser.add_argument('--transports', default=','.join(TRANSPORTS),
+                        help='Comma separated transports (inet, unix)')
+    parser.add_argument('--repeats', type=int, default=1000,
+                        help='Round trips of the smallest systems')
+    parser.add_argument('--output', default='socket_bench.json',
+                        help='Append the results here (JSON lines)')
+    return parser.parse_args()
+
+
+def main():
+    args = _parser()
+    transports = args.transports.split(',')
+    for transport in transports:
+        if transport not in TRANSPORTS:
+            sys.stderr.write('Unknown transport: {}\n'.format(transport))
+            sys.exit(1)
+    bench = SocketBench([int(n) for n in args.natoms.split(',')], transports,
+                        repeats=args.repeats)
+    run = dict(version=_version(), host=platform.node(),
+               python=platform.python_version(),
+               date=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    row = '{:>8s} {:>6s} {:>8s} {:>12s} {:>12s} {:>10s}\n'
+    sys.stdout.write(row.format('natom', 'socket', 'repeats', 'p50 (ms)',
+                                'p95 (ms)', 'MB/s'))
+    with open(args.output, 'a') as jsonf:
+        for result in bench.run():
+            sys.stdout.write(row.format(
+                str(result['natom']), result['transport'],
+                str(result['repeats']),
+                '{:.3f}'.format(1e3 * result['latency_p50']),
+                '{:.3f}'.format(1e3 * result['latency_p95']),
+                '{:.1f}'.format(result['mb_per_s'])))
+            sys.stdout.flush()
+            result.update(run)
+            jsonf.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
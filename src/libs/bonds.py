@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: bonds
+# Creation: Oct 19, 2026
+#
+
+"""Bonds of a geometry from the covalent radii.
+
+Two atoms are bonded when their distance is shorter than the sum of their
+covalent radii plus a tolerance (0.45 Angstrom, as Open Babel does) and
+longer than min_distance. The candidate pairs come from a k-d tree
+(scipy.spatial.cKDTree) queried with the largest possible bond length, so
+the search is O(N log N) instead of comparing all the couples of atoms.
+
+For periodic geometries the atoms are wrapped in the cell and the tree is
+queried against the 27 images of the cell around it, so the bonds crossing
+the cell boundaries are found as well. Cells thinner than the longest bond
+would need more images and are not supported.
+
+Example:
+    >>> geo = GeoIo()
+    >>> geo.xyz_read('benzene.xyz')
+    >>> BondPerception(geo).bonds()
+    [(0, 1), (0, 5), (0, 6), ...]
+
+"""
+
+import itertools
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+# Covalent radii (Angstrom) from Cordero et al., Dalton Trans. 2008, 2832
+# (sp3 carbon, low spin metals)
+COVALENT_RADII = dict(
+    H=0.31, He=0.28,
+    Li=1.28, Be=0.96, B=0.84, C=0.76, N=0.71, O=0.66, F=0.57, Ne=0.58,
+    Na=1.66, Mg=1.41, Al=1.21, Si=1.11, P=1.07, S=1.05, Cl=1.02, Ar=1.06,
+    K=2.03, Ca=1.76, Sc=1.70, Ti=1.60, V=1.53, Cr=1.39, Mn=1.39, Fe=1.32,
+    Co=1.26, Ni=1.24, Cu=1.32, Zn=1.22, Ga=1.22, Ge=1.20, As=1.19, Se=1.20,
+    Br=1.20, Kr=1.16,
+    Rb=2.20, Sr=1.95, Y=1.90, Zr=1.75, Nb=1.64, Mo=1.54, Tc=1.47, Ru=1.46,
+    Rh=1.42, Pd=1.39, Ag=1.45, Cd=1.44, In=1.42, Sn=1.39, Sb=1.39, Te=1.38,
+    I=1.39, Xe=1.40,
+    Cs=2.44, Ba=2.15, Pt=1.36, Au=1.36, Hg=1.32, Pb=1.46, Bi=1.48,
+)
+
+
+def element(name):
+    """Return the element of an atom type, e.g. 'C' for 'c' or 'C12'."""
+    letters = ''.join(char for char in name if char.isalpha())
+    return letters[:1].upper() + letters[1:2].lower()
+
+
+class BondPerception(object):
+    """Find the bonds of a geometry.
+
+    Args:
+        Geometry: geometry object as defined in the libs module; periodic
+            geometries use their lattice vectors.
+        tolerance: Angstrom added to the sum of the covalent radii.
+        min_distance: shorter distances are overlapping atoms, not bonds.
+
+    """
+    def __init__(self, Geometry, tolerance=0.45, min_distance=0.4):
+        self.tolerance = float(tolerance)
+        self.min_distance = float(min_distance)
+        self.coords = np.asarray(Geometry.coords, dtype=float)
+        self.radii = self._radii(Geometry)
+        self.latvecs = None
+        if Geometry.periodic and len(Geometry.latvecs):
+            self.latvecs = np.array(Geometry.latvecs, dtype=float)
+
+    @staticmethod
+    def _radii(Geometry):
+        per_specie = []
+        for name in Geometry.specienames:
+            try:
+                per_specie.append(COVALENT_RADII[element(name)])
+            except KeyError:
+                raise UnknownElement(name)
+        return np.array(per_specie)[np.asarray(Geometry.indexes, dtype=int)]
+
+    def cutoff(self):
+        """The longest possible bond."""
+        return 2.0 * self.radii.max() + self.tolerance
+
+    def _keep(self, first, second, distances):
+        """Mask of the candidate pairs that are bonds."""
+        limit = self.radii[first] + self.radii[second] + self.tolerance
+        return (distances > self.min_distance) & (distances <= limit)
+
+    def _cluster_pairs(self):
+        tree = cKDTree(self.coords)
+        pairs = tree.query_pairs(self.cutoff(), output_type='ndarray')
+        if not len(pairs):
+            return pairs
+        distances = np.linalg.norm(self.coords[pairs[:, 0]] -
+                                   self.coords[pairs[:, 1]], axis=1)
+        return pairs[self._keep(pairs[:, 0], pairs[:, 1], distances)]
+
+    def _periodic_pairs(self):
+        widths = abs(np.linalg.det(self.latvecs)) / np.linalg.norm(
+            np.cross(self.latvecs[[1, 2, 0]], self.latvecs[[2, 0, 1]]),
+            axis=1)
+        if widths.min() < self.cutoff():
+            raise ValueError('The cell is thinner ({:.2f} A) than the '
+                             'longest bond ({:.2f} A)'.format(widths.min(),
+                                                              self.cutoff()))
+        fractional = np.linalg.solve(self.latvecs.T, self.coords.T).T
+        wrapped = (fractional - np.floor(fractional)).dot(self.latvecs)
+        tree = cKDTree(wrapped)
+        found = []
+        for shift in itertools.product((-1, 0, 1), repeat=3):
+            image = cKDTree(wrapped + np.dot(shift, self.latvecs))
+            matrix = tree.sparse_distance_matrix(image, self.cutoff(),
+                                                 output_type='ndarray')
+            if not len(matrix):
+                continue
+            first, second = matrix['i'], matrix['j']
+            keep = self._keep(first, second, matrix['v'])
+            found.append(np.stack([first[keep], second[keep]], axis=1))
+        if not found:
+            return np.empty((0, 2), dtype=int)
+        pairs = np.concatenate(found)
+        return np.unique(np.sort(pairs, axis=1), axis=0)
+
+    def bonds(self):
+        """Return the sorted list of the bonds (i, j), i < j, 0-based."""
+        if self.latvecs is None:
+            pairs = self._cluster_pairs()
+        else:
+            pairs = self._periodic_pairs()
+        pairs = np.sort(np.asarray(pairs, dtype=int).reshape(-1, 2), axis=1)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+        return [(int(i), int(j)) for i, j in pairs[order]]
+
+
+class UnknownElement(Exception):
+    """Raised when the covalent radius of an atom type is not known.
+
+    Args:
+        name: the atom type.
+
+    """
+    def __init__(self, name):
+        super().__init__('No covalent radius for the atom type {}'.format(
+            name))
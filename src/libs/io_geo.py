@@ -12,6 +12,7 @@
 import sys
 from libs.geometry import Geometry
 from libs.filetype import BannerLines
+from libs.io_pdb import PdbReader, PdbWriter
 import numpy as np
 
 
@@ -135,44 +136,56 @@ class GeoIo(Geometry):
             filepath: the path of the file to be readed.
 
         Todo:
-            This should be implemented to work with file objects intead of path.
             Implement the fractional coordinates (low priority)
         """
-        frame = 0
-        coords = []
         with open(filepath) as f:
-            for k, line in enumerate(f):
-                if BannerLines().gen.match(line):  # Check if the first line is
-                                                # the first line matches the
-                                                # expected format
-                    natom = int(line.split()[0])
-                    mode = line.split()[1].strip()
-                    supercell = mode == 'S'
-                    cluster = mode == 'C'
-                    crystal = mode == 'F'
-                    if crystal:
-                        # The fractional coordinates
-                        # are not implemented!
-                        raise NotImplementedError(
-                            'F is not usable with this script')
-                    # Just to avoid error style error and to be consistent
-                    if cluster or supercell: pass
-                    frame += 1
-                    # If there are more lines with the "banner" format
-                    # raise the error
-                    if frame > 1: raise IsTrajectory(filepath)
+            self.gen_reads(f.read(), filepath)
 
-                if k == 1: self.specienames = line.split()
-                if k > 1 and k < 2 + natom:
-                    _, tmp, x, y, z = line.split()
-                    self.indexes.append(int(tmp) - 1)
-                    coords.append([float(x), float(y), float(z)])
-                if supercell and k > 2 + natom:
-                    self.origin = [float(x) for x in line.split()]
-                if supercell and k > 3 + natom:
-                    self.lattice.append([float(x) for x in line.split()])
+    def gen_reads(self, text, filepath='<string>'):
+        """Read the gen geometry from a string.
+
+        Used by gen_read and to read the GenFormat block inlined in a dftb+
+        input.
+
+        Args:
+            text: the geometry in gen format.
+            filepath: where the text comes from (used in error messages).
+
+        """
+        coords = []
+        natom = None
+        supercell = False
+        self.indexes = []
+        self.latvecs = []
+        for k, line in enumerate(text.strip().splitlines()):
+            if k == 0 and BannerLines().gen.match(line):
+                natom = int(line.split()[0])
+                mode = line.split()[1].strip().upper()
+                supercell = mode == 'S'
+                if mode == 'F':
+                    # The fractional coordinates are not implemented!
+                    raise NotImplementedError(
+                        'F is not usable with this script')
+            elif BannerLines().gen.match(line):
+                # If there are more lines with the "banner" format
+                # raise the error
+                raise IsTrajectory(filepath)
+
+            if natom is None:
+                raise ValueError('{} is not in gen format'.format(filepath))
+            if k == 1: self.specienames = line.split()
+            if k > 1 and k < 2 + natom:
+                _, tmp, x, y, z = line.split()[:5]
+                self.indexes.append(int(tmp) - 1)
+                coords.append([float(x), float(y), float(z)])
+            if supercell and k == 2 + natom:
+                self.origin = [float(x) for x in line.split()]
+            if supercell and 2 + natom < k < 6 + natom:
+                self.latvecs.append([float(x) for x in line.split()])
         self.coords = np.array(coords)
         self.natom = natom
+        self.nspecie = len(self.specienames)
+        self.periodic = supercell
         if len(self.coords) != self.natom:
             raise WrongNumberOfAtoms(self.natom, len(self.coords))
 
@@ -188,7 +201,6 @@ class GeoIo(Geometry):
         gen_format = '{a:5d}  {b:3d}  {x:12.6f}  {y:12.6f}  {z:12.6f}\n'.format
         if self.periodic:
             mode = 'S'
-            print (self.origin)
             toappend = ' '.join(map(lambda x: str(x), self.origin)) + '\n'
             for vect in self.latvecs:
                 toappend += ' '.join(map(lambda x: str(x), vect)) + '\n'
@@ -198,12 +210,33 @@ class GeoIo(Geometry):
         msg = '{0:5d}  {1:1s}\n'.format(self.natom, mode)
         msg += ' '.join(self.specienames) + '\n'
         for i, coord in enumerate(self.coords):
-            print(coord)
-            msg += gen_format(a=i, b=self.indexes[i] + 1,
+            msg += gen_format(a=i + 1, b=self.indexes[i] + 1,
                               x=coord[0], y=coord[1], z=coord[2])
         msg += toappend
         return msg
 
+    def pdb_read(self, filepath):
+        """Read the atoms (and the cell of CRYST1) of a PDB file.
+
+        Returns:
+            The PdbReader, holding also the bonds of the CONECT records.
+
+        """
+        reader = PdbReader(filepath).read()
+        reader.to_geometry(self)
+        self.filepath = filepath
+        return reader
+
+    def pdb_write(self, filepath, bonds=None):
+        """Write the geometry in a PDB file.
+
+        Args:
+            filepath: the PDB file.
+            bonds: couples of atoms (from 0) written as CONECT records.
+
+        """
+        PdbWriter(self, bonds).write(filepath)
+
 
 class IsTrajectory(Exception):
     """If the file is a trajectory while a single structure was expected.
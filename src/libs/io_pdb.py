@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: io_pdb
+# Creation: Oct 19, 2026
+#
+
+"""Read and write the PDB files, as needed by the MOLINFO of plumed.
+
+The reader goes once through the file and keeps only the records used here,
+cutting the fixed columns of the PDB format (so that fields touching each
+other, as large coordinates or serials, are read correctly):
+
+ATOM, HETATM
+    serial, atom name, element and coordinates;
+CONECT
+    the bonds, as couples of serials;
+CRYST1
+    the cell.
+
+Only the first model is read. The writer streams the ATOM and CONECT records
+of a geometry to a file, one residue MOL with all the atoms.
+
+"""
+
+import numpy as np
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+# The serials have five columns
+MAX_ATOMS = 99999
+
+
+def _element(name):
+    """Element from an atom name when the element columns are empty."""
+    letters = ''.join(char for char in name if char.isalpha())
+    return letters[:1].upper() + letters[1:2].lower()
+
+
+def cell_vectors(a, b, c, alpha=90.0, beta=90.0, gamma=90.0):
+    """Lattice vectors (rows) from the CRYST1 parameters, a along x."""
+    alpha, beta, gamma = np.radians([alpha, beta, gamma])
+    cx = np.cos(beta)
+    cy = (np.cos(alpha) - np.cos(beta) * np.cos(gamma)) / np.sin(gamma)
+    return np.array([[a, 0.0, 0.0],
+                     [b * np.cos(gamma), b * np.sin(gamma), 0.0],
+                     [c * cx, c * cy, c * np.sqrt(1.0 - cx ** 2 - cy ** 2)]])
+
+
+class PdbReader(object):
+    """Atoms, bonds and cell of a PDB file, read in one pass.
+
+    Args:
+        filepath: the PDB file.
+
+    Attributes:
+        serials: serial of each atom (int32 array).
+        names: atom name of each atom.
+        elements: element of each atom.
+        coords: coordinates (natom x 3 array, Angstrom).
+        conect: bonds as couples of serials (nbond x 2 int32 array), as
+            written in the file (a bond usually appears twice).
+        latvecs: lattice vectors of CRYST1, None if missing.
+
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.serials = np.empty(0, dtype=np.int32)
+        self.names = []
+        self.elements = []
+        self.coords = np.empty((0, 3))
+        self.conect = np.empty((0, 2), dtype=np.int32)
+        self.latvecs = None
+
+    def read(self):
+        serials = []
+        coords = []
+        conect = []
+        with open(self.filepath) as pdbf:
+            for line in pdbf:
+                record = line[:6]
+                if record == 'ATOM  ' or record == 'HETATM':
+                    serials.append(int(line[6:11]))
+                    name = line[12:16].strip()
+                    self.names.append(name)
+                    self.elements.append(line[76:78].strip().capitalize() or
+                                         _element(name))
+                    coords.append((float(line[30:38]), float(line[38:46]),
+                                   float(line[46:54])))
+                elif record == 'CONECT':
+                    atom = int(line[6:11])
+                    for start in range(11, 31, 5):
+                        field = line[start:start + 5].strip()
+                        if field:
+                            conect.append((atom, int(field)))
+                elif record == 'CRYST1':
+                    self.latvecs = cell_vectors(
+                        float(line[6:15]), float(line[15:24]),
+                        float(line[24:33]), float(line[33:40]),
+                        float(line[40:47]), float(line[47:54]))
+                elif record == 'ENDMDL':
+                    break
+        self.serials = np.array(serials, dtype=np.int32)
+        self.coords = np.array(coords, dtype=float).reshape(-1, 3)
+        self.conect = np.array(conect, dtype=np.int32).reshape(-1, 2)
+        return self
+
+    def bonds(self):
+        """Return the bonds as sorted couples of atom numbers.
+
+        The atoms are numbered from 1 in the order of the file, as plumed
+        does; the serials of CONECT are translated accordingly. Without ATOM
+        records the serials are taken as the atom numbers.
+
+        """
+        if not len(self.conect):
+            return np.empty((0, 2), dtype=np.int32)
+        if not len(self.serials):
+            pairs = np.sort(self.conect, axis=1)
+        else:
+            order = np.argsort(self.serials)
+            position = np.searchsorted(self.serials, self.conect,
+                                       sorter=order)
+            position = np.clip(position, 0, len(order) - 1)
+            index = order[position]
+            known = (self.serials[index] == self.conect).all(axis=1)
+            pairs = np.sort(index[known] + 1, axis=1)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        return np.unique(pairs, axis=0).astype(np.int32)
+
+    def check(self, Geometry):
+        """Raise ValueError if the file does not describe Geometry.
+
+        The atoms have to be the same, with the same elements in the same
+        order. A file with only CONECT records cannot be compared: its bonds
+        must refer to atoms of Geometry.
+
+        """
+        expected = [_element(Geometry.specienames[i])
+                    for i in Geometry.indexes]
+        if not len(self.serials):
+            bonds = self.bonds()
+            if len(bonds) and bonds.max() > Geometry.natom:
+                raise ValueError('{}: bond to atom {:d}, the geometry has '
+                                 '{:d} atoms'.format(self.filepath,
+                                                     int(bonds.max()),
+                                                     Geometry.natom))
+            return
+        if len(self.elements) != len(expected):
+            raise ValueError('{}: {:d} atoms, the geometry has {:d}'.format(
+                self.filepath, len(self.elements), len(expected)))
+        for i, (found, wanted) in enumerate(zip(self.elements, expected)):
+            if found != wanted:
+                raise ValueError('{}: atom {:d} is {}, {} in the geometry'
+                                 .format(self.filepath, i + 1, found, wanted))
+
+    def to_geometry(self, Geometry):
+        """Fill Geometry (as defined in the libs module) with the atoms."""
+        Geometry.specienames = sorted(set(self.elements))
+        Geometry.nspecie = len(Geometry.specienames)
+        position = {name: i for i, name in enumerate(Geometry.specienames)}
+        Geometry.indexes = [position[el] for el in self.elements]
+        Geometry.natom = len(self.elements)
+        Geometry.coords = self.coords
+        Geometry.comment = 'Read from {}'.format(self.filepath)
+        if self.latvecs is not None:
+            Geometry.latvecs = self.latvecs.tolist()
+            Geometry.origin = [0.0] * 3
+            Geometry.periodic = True
+        return Geometry
+
+
+class PdbWriter(object):
+    """Write a geometry, and its bonds, in the PDB format.
+
+    Args:
+        Geometry: geometry object as defined in the libs module.
+        bonds: couples of atom numbers (from 0) bonded, None for no CONECT.
+        residue: name of the residue of all the atoms.
+
+    """
+    atom_tmpl = 'HETATM{serial:5d} {name:4s} {residue:3s} A   1    ' \
+                '{x:8.3f}{y:8.3f}{z:8.3f}  1.00  0.00          {element:>2s}\n'
+
+    def __init__(self, Geometry, bonds=None, residue='MOL'):
+        if Geometry.natom > MAX_ATOMS:
+            raise ValueError('The PDB format holds at most {:d} atoms'.format(
+                MAX_ATOMS))
+        self.Geometry = Geometry
+        self.bonds = bonds
+        self.residue = residue
+
+    def _atom_lines(self):
+        geo = self.Geometry
+        counts = {}
+        for i, (x, y, z) in enumerate(np.asarray(geo.coords, dtype=float)):
+            element = _element(geo.specienames[geo.indexes[i]])
+            counts[element] = counts.get(element, 0) + 1
+            name = element + str(counts[element])
+            # One letter elements start in the second column of the name
+            if len(element) == 1 and len(name) < 4:
+                name = ' ' + name
+            yield self.atom_tmpl.format(serial=i + 1, name=name[:4],
+                                        residue=self.residue, x=x, y=y, z=z,
+                                        element=element)
+
+    def _conect_lines(self):
+        neighbours = {}
+        for at1, at2 in self.bonds:
+            neighbours.setdefault(int(at1), []).append(int(at2))
+            neighbours.setdefault(int(at2), []).append(int(at1))
+        for atom in sorted(neighbours):
+            partners = sorted(neighbours[atom])
+            for start in range(0, len(partners), 4):
+                yield 'CONECT{:5d}'.format(atom + 1) + ''.join(
+                    '{:5d}'.format(p + 1)
+                    for p in partners[start:start + 4]) + '\n'
+
+    def _cryst1(self):
+        latvecs = np.array(self.Geometry.latvecs, dtype=float)
+        a, b, c = np.linalg.norm(latvecs, axis=1)
+
+        def angle(u, v):
+            return np.degrees(np.arccos(np.dot(u, v) /
+                                        np.linalg.norm(u) / np.linalg.norm(v)))
+        return 'CRYST1{:9.3f}{:9.3f}{:9.3f}{:7.2f}{:7.2f}{:7.2f} P 1' \
+               '           1\n'.format(a, b, c,
+                                       angle(latvecs[1], latvecs[2]),
+                                       angle(latvecs[0], latvecs[2]),
+                                       angle(latvecs[0], latvecs[1]))
+
+    def write(self, filepath):
+        with open(filepath, 'w') as pdbf:
+            pdbf.write('REMARK   Written by inputsGen\n')
+            if self.Geometry.periodic and len(self.Geometry.latvecs):
+                pdbf.write(self._cryst1())
+            pdbf.writelines(self._atom_lines())
+            if self.bonds is not None:
+                pdbf.writelines(self._conect_lines())
+            pdbf.write('END\n')
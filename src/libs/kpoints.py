@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: kpoints
+# Creation: Oct 19, 2026
+#
+
+"""Monkhorst-Pack k-point grids for periodic geometries.
+
+The number of k-points along each reciprocal lattice vector is chosen so that
+the corresponding real-space supercell is at least *length* Angstrom wide,
+i.e. n_i = ceil(length * |b_i| / 2pi). Small cells get dense grids, large
+cells end up at the Gamma point only.
+
+"""
+
+import numpy as np
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+class MonkhorstPack(object):
+    """Monkhorst-Pack grid derived from the lattice vectors of a geometry.
+
+    Args:
+        Geometry: a periodic geometry as defined in the libs module.
+        length: minimum width (Angstrom) of the supercell sampled by the grid.
+
+    Attributes:
+        grid: number of k-points along each reciprocal lattice vector.
+        shift: shift of the grid; 0.5 along the even directions gives the
+            Monkhorst-Pack grid, odd directions are Gamma-centred anyway.
+
+    """
+    def __init__(self, Geometry, length=20.0):
+        if not Geometry.periodic:
+            raise ValueError('k-points are meaningful only for periodic '
+                             'geometries')
+        self.length = float(length)
+        self.latvecs = np.array(Geometry.latvecs, dtype=float)
+        self.grid = self._grid()
+        self.shift = np.where(self.grid % 2 == 0, 0.5, 0.0)
+
+    def reciprocal(self):
+        """Reciprocal lattice vectors (rows) in 1/Angstrom, 2pi included."""
+        return 2.0 * np.pi * np.linalg.inv(self.latvecs).T
+
+    def _grid(self):
+        norms = np.linalg.norm(self.reciprocal(), axis=1)
+        grid = np.ceil(self.length * norms / (2.0 * np.pi) - 1.0e-8)
+        return np.maximum(grid, 1).astype(int)
+
+    def kpoints(self):
+        """All the k-points of the grid in fractional coordinates.
+
+        The points are folded in the (-0.5, 0.5] interval.
+
+        """
+        axes = [(np.arange(n) + s) / n for n, s in zip(self.grid, self.shift)]
+        mesh = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1)
+        kpts = mesh.reshape(-1, 3)
+        return kpts - np.ceil(kpts - 0.5)
+
+    def irreducible(self):
+        """Number of k-points left after the time-reversal reduction.
+
+        k and -k give the same eigenvalues, so only one point of each pair is
+        computed. This is the reduction dftb+ applies to the SupercellFolding
+        grids; the point group of the lattice is not used.
+
+        """
+        # Integer coordinates on a grid twice as fine, to include the shifts
+        period = 2 * self.grid
+        kpts = np.round(self.kpoints() * period).astype(int) % period
+        mirror = (-kpts) % period
+        # Represent each (k, -k) pair by its lexicographically smaller point
+        canonical = np.where(self._lexless(mirror, kpts)[:, None],
+                             mirror, kpts)
+        return len(np.unique(canonical, axis=0))
+
+    @staticmethod
+    def _lexless(a, b):
+        """Row-wise lexicographic a < b."""
+        diff = a != b
+        first = np.argmax(diff, axis=1)
+        rows = np.arange(len(a))
+        return diff.any(axis=1) & (a[rows, first] < b[rows, first])
+
+    def supercell_folding(self):
+        """Return the body of the SupercellFolding block of dftb+."""
+        msg = ''
+        for i, n in enumerate(self.grid):
+            row = [0, 0, 0]
+            row[i] = n
+            msg += '{:d} {:d} {:d}\n'.format(*row)
+        msg += '{:.1f} {:.1f} {:.1f}'.format(*self.shift)
+        return msg
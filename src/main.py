@@ -19,13 +19,24 @@ sys.path.append(os.path.join(HEREDIR, 'ports/port-for'))
 
 import argparse
 import stat
+import math
 import ports.ports_master as portsMaster
+from ports.port_registry import PortRegistry
+from ports.port_probe import probe_ports, BUSY
 import ipi.input_ipi as ipi
 import dftbp.input_dftb as dftb
+from dftbp.replica_inputs import ReplicaInputs
+from dftbp.dftb_cost import DftbCostModel
+from dftbp.dftb_data import DftbPreset
+from libs.kpoints import MonkhorstPack
 from libs.io_geo import GeoIo
 from slurm.make_script import SbatchDftbScript as sbatch
 from slurm.make_runMany import runManyDftbScript as rMany
 from slurm.make_runMany import runManyPlumedScript as rPMany
+from slurm.make_allinone import SbatchAllInOneScript as allInOne
+from slurm.staging import StagingScript
+from slurm.backends import BACKENDS, format_walltime
+from slurm.replica_db import ReplicaDb
 from plumed.plumed_input import plumed2 as plmd2
 
 # Try determining the version from git:
@@ -50,6 +61,7 @@ __status__ = 'development'
 
 config = dict(
     SKfileLocation='/home/petragli/remd@dftb3/slako/',
+    libdir=HEREDIR,
     username=os.environ.get('USER'),
     home=os.environ.get('HOME')
 )
@@ -59,33 +71,94 @@ def main():
     """ Main function.
     """
     args = _validate_args(_parser())
+    ports = args.pop('leased_ports')
+    try:
+        _write_inputs(args)
+    except BaseException:
+        # A run that could not be written does not keep its ports
+        PortRegistry().release(ports)
+        raise
 
+
+def _write_inputs(args):
+    """Write the inputs and the scripts of a run."""
     if args['rem'] == 'yes':
         title_for_sbatch = 'pippopluto_title'
     else:
-        titlen_for_sbatch = args['title']
+        title_for_sbatch = args['title']
+
+    geo = GeoIo()
+    geo.xyz_read(args['xyzfile'])
+    if 'cell' in args:
+        geo.set_cell(args['cell'])
+
+    array = args.pop('submit_mode') == 'array'
+    single_job = args.pop('single_job')
+    scheduler = args.pop('scheduler')
+    if scheduler == 'local':
+        # The executors pin all the jobs, of any submission, on disjoint
+        # cores
+        backend = BACKENDS[scheduler](
+            os.path.join(config['libdir'], 'slurm', 'local_executor.py'))
+        array = True
+    else:
+        backend = BACKENDS[scheduler]()
+    # Replicas, jobs and heartbeats are tracked in a database
+    heartbeat = args.pop('heartbeat')
+    submit_timeout = args.pop('submit_timeout')
+    replica_db = os.path.abspath('replicas.db')
+    replica_tool = os.path.join(config['libdir'], 'slurm', 'replica_db.py')
+    ReplicaDb(replica_db).init(args['slots'], os.getcwd())
+    if single_job and scheduler != 'slurm':
+        msg = 'A single allocation is available only with SLURM.'
+        raise(NotImplementedError(msg))
+    ipi_exe = args.pop('ipi_exe')
+    chain = args.pop('chain')
+    link_walltime = args.pop('link_walltime')
+    if chain and not single_job:
+        msg = 'A chained run needs --single-job.'
+        raise(ValueError(msg))
+    stage_interval = args.pop('stage_interval')
+    flush_timeout = args.pop('flush_timeout')
+    staging = None
+    if stage_interval > 0:
+        staging = StagingScript(stage_interval, flush_timeout)
 
     sbatch_script = sbatch(title=title_for_sbatch,
                            mem=args['mem'],
                            task_per_node=args['processors'],
                            executable=args['dftb_exe'],
-                           home=config['home'])
-    args.pop('mem')
-    args.pop('processors')
+                           home=config['home'],
+                           natom=geo.natom,
+                           charges_checker=os.path.join(config['libdir'],
+                                                        'dftbp', 'charges.py'),
+                           array=array,
+                           nreps=args['slots'],
+                           cores_per_node=args.pop('cores_per_node', None),
+                           staging=staging,
+                           backend=backend,
+                           replica_db=replica_db,
+                           replica_tool=replica_tool,
+                           heartbeat=heartbeat)
+    mem = args.pop('mem')
+    walltime = args.pop('walltime')
+    max_walltime = args.pop('max_walltime')
+    step_cost = args.pop('step_cost', None)
+    processors = args.pop('processors')
     args.pop('dftb_exe')
 
+    plumed_compact = args.pop('plumed_compact')
     if args['bias']:
         if args['isUnix']:
             msg = 'Bias can be used only over internet, unix not implemented.'
             raise(NotImplementedError(msg))
-        if not os.path.isfile(args['xyzfile'][:-4]+'.pdb'):
-            print(args['xyzfile'][:-4]+'.pdb')
-            msg = 'FileNotFound: {out:s}.\n\n'\
-                  'The command:\nobabel {inf:s} -O{out:s}\ncan helps.'.format(
-                      out=args['xyzfile'][:-4]+'.pdb', inf=args['xyzfile'])
-            raise(IOError(msg))
-        plmd2(args['xyzfile'], options=args, home=config['home']).write('plumed.dat')
+        # The bonds come from the .pdb next to the xyz if there is one,
+        # otherwise they are found from the coordinates
+        plmd2(args['xyzfile'], options=args, home=config['home'],
+              staging=staging, backend=backend, Geometry=geo,
+              compact=plumed_compact).write('plumed.dat')
         rmscript = rPMany(nreps=args['slots'],
+                          backend=backend,
                          title=args['title']).write()
         with open('runManyPlumed.sh', 'w') as runManyf:
             runManyf.write(rmscript)
@@ -94,26 +167,96 @@ def main():
 
 
 
-    # Write data to the dftb input
-    geo = GeoIo()
-    geo.xyz_read(args['xyzfile'])
-    if not geo.periodic:
-        geo.set_cell([100., 100., 100.])
-    dftbpI = dftb.InputDftb(geo, config['SKfileLocation'])
-    dftbpI.add_keyword('Driver_Protocol', 'i-PI{}')
-    dftbpI.add_keyword('Driver_MaxSteps', 10000000)
-    if args['isUnix']:
-        dftbpI.add_keyword('Driver_File', args['address'])
-    else:
-        dftbpI.add_keyword('Driver_Host', args['address'])
-        dftbpI.add_keyword('Driver_Port', args['port'])
-    if not args.pop('ddmc'):
-        dftbpI.add_keyword('Hamiltonian_Dispersion_', 'LennardJones')
-        dftbpI.add_keyword('Hamiltonian_Dispersion_Parameters','UFFParameters{}')
+    # Write data to the dftb input: non periodic systems are written as
+    # clusters, no fake box around them.
+    hsd_template = args.pop('hsd_template', None)
+    ddmc = args.pop('ddmc')
+    dftb_type = args.pop('dftb_type')
+    fixed_solver = args.pop('fixed_solver')
+    kpoint_length = args.pop('kpoint_length')
+    if hsd_template:
+        # A hand-tuned input is used as such: only the driver is patched
+        dftbpI = dftb.InputDftb.from_hsd(hsd_template,
+                                         config['SKfileLocation'])
+        # The cost model, plumed and i-PI use the xyz: the template must
+        # describe the same atoms, in the same order
+        template = dftbpI.Geometry
+        template_atoms = [template.specienames[i] for i in template.indexes]
+        xyz_atoms = [geo.specienames[i] for i in geo.indexes]
+        if template_atoms != xyz_atoms:
+            msg = 'The geometry of {} ({:d} atoms, {}) is not the one of ' \
+                  '{} ({:d} atoms, {})'.format(
+                      hsd_template, len(template_atoms),
+                      _formula(template_atoms), args['xyzfile'],
+                      len(xyz_atoms), _formula(xyz_atoms))
+            if len(template_atoms) == len(xyz_atoms) and \
+                    sorted(template_atoms) == sorted(xyz_atoms):
+                msg += ': the atoms are in a different order'
+            raise(ValueError(msg))
     else:
-        dftbpI.add_keyword('Hamiltonian_Dispersion', 'dDMC {}')
+        dftbpI = dftb.InputDftb(geo, config['SKfileLocation'])
+        dftbpI.kpoint_length = kpoint_length
+        if not ddmc:
+            dftbpI.add_keyword('Hamiltonian_Dispersion_', 'LennardJones')
+            dftbpI.add_keyword('Hamiltonian_Dispersion_Parameters','UFFParameters{}')
+        else:
+            dftbpI.add_keyword('Hamiltonian_Dispersion', 'dDMC {}')
+
+        dftbpI.set_preset(dftb_type)
+
+    # Choose eigensolver, mixer and threads from the size of the system
+    # (a template keeps its own) and estimate the resources of the jobs
+    nkpoints = 1
+    if geo.periodic:
+        nkpoints = MonkhorstPack(geo, kpoint_length).irreducible()
+    cost = DftbCostModel(geo,
+                         dftbpI.parameters_set or
+                         DftbPreset().get(dftb_type)['_parameters_set'],
+                         processors=processors,
+                         scc=dftbpI.is_enabled('Hamiltonian_SCC'),
+                         kpoints=nkpoints)
+    sys.stderr.write(cost.report())
+    if not fixed_solver and not hsd_template:
+        keywords, threads = cost.select()
+        for k, v in keywords.items():
+            dftbpI.add_keyword(k, v)
+        sbatch_script.ntasks_per_nodes = threads
+    solver = dftbpI.get('Hamiltonian_Eigensolver')
+    if solver not in cost.solvers:
+        solver = cost.best_solver()
+    est_mem, est_time = cost.resources(args['nstep'], solver,
+                                       int(sbatch_script.ntasks_per_nodes),
+                                       step_cost)
+    if mem == 'auto':
+        sbatch_script.mem = est_mem
+    # Length of the whole run, a chained run is split on it
+    run_time = sbatch_script.walltime
+    if walltime == 'auto' and step_cost is None:
+        # The flops of the cost model are a guess: no time limit from it
+        sys.stderr.write('WARNING: the walltime cannot be estimated without '
+                         '--step-cost, the jobs get the default walltime of '
+                         'the partition\n')
+    elif walltime == 'auto':
+        run_time = est_time
+        sbatch_script.walltime = est_time
+        if est_time > max_walltime:
+            # Longer runs are restarted from their checkpoint
+            sys.stderr.write('WARNING: the estimated walltime ({}) is longer '
+                             'than --max-walltime, the jobs ask for {}\n'
+                             .format(format_walltime(est_time),
+                                     format_walltime(max_walltime)))
+            sbatch_script.walltime = max_walltime
+    elif walltime != 'none':
+        sbatch_script.walltime = walltime
+    sys.stderr.write('Each DFTB+ client asks for {} MB and {}\n'.format(
+        sbatch_script.mem,
+        format_walltime(sbatch_script.walltime)
+        if sbatch_script.walltime else 'the default walltime'))
 
-    dftbpI.set_preset(args.pop('dftb_type'))
+    if args['isUnix']:
+        dftbpI.set_socket_driver(filename=args['address'])
+    else:
+        dftbpI.set_socket_driver(host=args['address'], port=args['port'])
 
     with open('dftb_in.hsd', 'w') as dftbf:
         dftbf.write(dftbpI.write())
@@ -123,6 +266,11 @@ def main():
     for k, v in args.items():
         if k == 'mode': continue
         ipiI.set(k, v)
+    # The DFTB+ clients compute a cluster when the geometry is not periodic
+    ipiI.set('pbc', 'yes' if geo.periodic else 'no')
+    if chain:
+        # i-PI stops cleanly before the end of each link
+        ipiI.set('total_time', max(60, link_walltime - 600))
 
     with open('ipi_input.xml', 'wb') as ipif:
         # print(type(ipiI.create_input()))
@@ -131,14 +279,93 @@ def main():
     with open('dftbp.sbatch', 'w') as sbatchf:
         sbatchf.write(sbatch_script.write())
 
+    # Each replica gets its own dftb input tuned on its temperature
+    hsd_filename = None
+    if args['rem'] == 'yes':
+        replicas = ReplicaInputs(dftbpI, ipiI.temp_list)
+        replicas.write()
+        hsd_filename = replicas.filename
+
+    if scheduler == 'local':
+        backend.cpus_per_task = int(sbatch_script.ntasks_per_nodes) * \
+            sbatch_script.clients_per_job()
+
     # if args['rem'] == 'yes':
     rmscript = rMany(nreps=args['slots'],
-                     title=args['title']).write()
+                     title=args['title'],
+                     hsd_filename=hsd_filename,
+                     array=array,
+                     clients_per_job=sbatch_script.clients_per_job(),
+                     backend=backend,
+                     replica_db=replica_db,
+                     replica_tool=replica_tool,
+                     stale=5 * heartbeat,
+                     submit_timeout=submit_timeout).write()
     with open('runMany.sh', 'w') as runManyf:
         runManyf.write(rmscript)
     st = os.stat('runMany.sh')
     os.chmod('runMany.sh', st.st_mode | stat.S_IEXEC)
 
+    # The ports of the run are released once it is over
+    run_ports = ' '.join(str(p) for p in
+                         [args['port'], args.get('port_bias')] if p)
+    release = 'python3 {} release {}'.format(
+        os.path.join(config['libdir'], 'ports', 'port_registry.py'),
+        run_ports)
+
+    # The watchdog resubmits the dead clients through runMany.sh
+    with open('watchdog.sh', 'w') as watchdogf:
+        watchdogf.write(
+            '#!/bin/bash\n'
+            '# Resubmit the dead DFTB+ clients until i-PI is over, touch\n'
+            '# WATCHDOG.stop to stop before (the ports of the run are then\n'
+            '# released)\n'
+            'cd {cwd}\n'
+            'nohup python3 {tool} {db} --scheduler {scheduler} '
+            '--interval {interval} --stale {stale} '
+            '--submit-timeout {submit_timeout} --release-ports {ports} '
+            '--restart {cwd}/RESTART '
+            '> watchdog.log 2>&1 &\n'
+            .format(cwd=os.getcwd(),
+                    tool=os.path.join(config['libdir'], 'slurm',
+                                      'watchdog.py'),
+                    db=replica_db, scheduler=scheduler, interval=heartbeat,
+                    stale=5 * heartbeat, submit_timeout=submit_timeout,
+                    ports=run_ports))
+    st = os.stat('watchdog.sh')
+    os.chmod('watchdog.sh', st.st_mode | stat.S_IEXEC)
+
+    # i-PI, the clients and plumed in one single allocation
+    if single_job:
+        chain_links = None
+        single_walltime = sbatch_script.walltime
+        if chain:
+            # The whole run, split in links (one more for safety)
+            chain_links = 2
+            if isinstance(run_time, int):
+                chain_links = int(math.ceil(
+                    run_time / max(60, link_walltime - 600))) + 1
+            single_walltime = link_walltime
+        single = allInOne(title=args['title'],
+                          nreps=args['slots'],
+                          threads=sbatch_script.ntasks_per_nodes,
+                          mem=sbatch_script.mem,
+                          port=args['port'],
+                          address=args['address'],
+                          port_bias=args.get('port_bias'),
+                          isUnix=args['isUnix'],
+                          hsd_filename=hsd_filename,
+                          natom=geo.natom,
+                          charges_checker=sbatch_script.charges_checker,
+                          executable=sbatch_script.config['bin'],
+                          ipi_executable=ipi_exe,
+                          home=config['home'],
+                          walltime=single_walltime,
+                          chain_links=chain_links,
+                          release=release)
+        with open('rem_single.sbatch', 'w') as singlef:
+            singlef.write(single.write())
+
 
 def _validate_args(args):
     notNone_option = {}
@@ -149,16 +376,6 @@ def _validate_args(args):
                 if not _ispositive(v):
                     raise(ValueError('The value of ' + str(k) + ' must be positive!'))
 
-    if 'port' in notNone_option:
-        port = notNone_option['port']
-        if not portsMaster.is_port_free(port):
-            raise(ValueError('The port choosen ({}) is not available. Do not specify any port!'.format(port)))
-    else:
-        notNone_option['port'] = portsMaster.giveme_a_port()
-
-    if notNone_option['bias']:
-        notNone_option['port_bias'] = portsMaster.giveme_a_port()
-
     if 'title' not in notNone_option:
         notNone_option['title'] = notNone_option['xyzfile']
 
@@ -184,9 +401,59 @@ def _validate_args(args):
         notNone_option['rem'] = 'yes'
         notNone_option['slots'] = notNone_option['nrep']
 
+    policy = notNone_option['bias_policy']
+    if policy != 'constant' and 'bias_t0' not in notNone_option:
+        raise(ValueError('The bias policy {} needs --bias-t0'.format(policy)))
+    if policy == 'linear' and 'bias_t1' not in notNone_option:
+        raise(ValueError('The linear bias policy needs --bias-t1'))
+    if policy == 'sigmoid' and 'bias_width' not in notNone_option:
+        raise(ValueError('The sigmoid bias policy needs --bias-width'))
+
+    # The ports are leased in the port registry: no other run can get them.
+    # With --probe they are also checked on the host i-PI listens on.
+    probe = notNone_option.pop('probe')
+    probe_timeout = notNone_option.pop('probe_timeout')
+    host = None
+    if probe and not notNone_option['isUnix']:
+        host = notNone_option['address']
+    owner = os.path.join(os.getcwd(), str(notNone_option['xyzfile']))
+    nports = 1 if notNone_option['bias'] else 0
+    if 'port' in notNone_option:
+        port = notNone_option['port']
+        if not PortRegistry().reserve(port, owner):
+            raise(ValueError('The port choosen ({}) is not available. Do not specify any port!'.format(port)))
+        if host is not None and \
+                probe_ports(host, [port], probe_timeout)[port] == BUSY:
+            PortRegistry().release([port])
+            raise(ValueError('The port choosen ({}) is already used on {}. Do not specify any port!'.format(port, host)))
+    else:
+        nports += 1
+    try:
+        ports = portsMaster.giveme_ports(nports, owner, host, probe_timeout) \
+            if nports else []
+    except Exception:
+        if 'port' in notNone_option:
+            PortRegistry().release([notNone_option['port']])
+        raise
+    if 'port' not in notNone_option:
+        notNone_option['port'] = ports.pop()
+
+    if notNone_option['bias']:
+        notNone_option['port_bias'] = ports.pop()
+    # Released by main if the inputs cannot be written
+    notNone_option['leased_ports'] = [notNone_option['port']]
+    if notNone_option['bias']:
+        notNone_option['leased_ports'].append(notNone_option['port_bias'])
+
     return notNone_option
 
 
+def _formula(atoms):
+    """Return the formula (e.g. C6 H6) of a list of atom types."""
+    return ' '.join('{}{:d}'.format(a, atoms.count(a))
+                    for a in sorted(set(atoms)))
+
+
 def _ispositive(number):
     """Simply return is a number is positive.
     """
@@ -233,6 +500,41 @@ def _parser():
                      default=False,
                      help='Steps between two replica exchanging attemps')
 
+    rem.add_argument('--plumed-compact',
+                     action='store_true',
+                     default=False,
+                     dest='plumed_compact',
+                     help='Restrain all the bonds with one DISTANCES and one '
+                          'bias in plumed.dat (plumed 2.5 or later)')
+
+    rem.add_argument('--bias-policy',
+                     action='store',
+                     default='constant',
+                     choices=['constant', 'step', 'linear', 'sigmoid'],
+                     dest='bias_policy',
+                     help='Scaling of the bias along the temperatures: '
+                          'constant (1 everywhere), step (0 below T0, 1 from '
+                          'T0, 0.5 between T0 and T1 if given), linear (0 '
+                          'at T0 to 1 at T1) or sigmoid (centred in T0)')
+    rem.add_argument('--bias-t0',
+                     action='store',
+                     default=None,
+                     type=float,
+                     dest='bias_t0',
+                     help='Temperature (K) where the bias switches on')
+    rem.add_argument('--bias-t1',
+                     action='store',
+                     default=None,
+                     type=float,
+                     dest='bias_t1',
+                     help='Temperature (K) of the full bias (step, linear)')
+    rem.add_argument('--bias-width',
+                     action='store',
+                     default=None,
+                     type=float,
+                     dest='bias_width',
+                     help='Width (K) of the sigmoid bias policy')
+
     ensemble = parser.add_argument_group('Ensemble',
                                          'Parameters for the ensamble')
     ensemble.add_argument('--temperature',
@@ -253,6 +555,13 @@ def _parser():
                             action='store',
                             type=str,
                             help='Geometry structure in xyz file')
+    initialize.add_argument('--cell',
+                            action='store',
+                            nargs=3,
+                            type=float,
+                            default=None,
+                            help='Lengths (Angstrom) of the orthorhombic cell '
+                                 'if the system is periodic')
     initialize.add_argument('--initial_temperature',
                             action='store',
                             default=300.0,
@@ -271,6 +580,17 @@ def _parser():
                           default=None,
                           type=int,
                           help='Port used by the socket. Leave it and I will try to find one')
+    ffsocket.add_argument('--probe',
+                          action='store_true',
+                          default=False,
+                          help='Check that the ports are free on --address '
+                               'before using them')
+    ffsocket.add_argument('--probe-timeout',
+                          action='store',
+                          default=0.5,
+                          type=float,
+                          dest='probe_timeout',
+                          help='Seconds to wait for each port probe')
     ffsocket.add_argument('--slots',
                           action='store',
                           default=1,
@@ -313,6 +633,22 @@ def _parser():
                        action='store_true',
                        default=False,
                        help='If specified will use ddmc instead of UFF dispersion correction')
+    dftbp.add_argument('--kpoint-length',
+                       action='store',
+                       default=20.0,
+                       type=float,
+                       help='Minimum supercell width (Angstrom) sampled by '
+                            'the Monkhorst-Pack grid of periodic systems')
+    dftbp.add_argument('--hsd-template',
+                       action='store',
+                       default=None,
+                       help='Use an existing dftb_in.hsd instead of a preset: '
+                            'only its Driver block is regenerated')
+    dftbp.add_argument('--fixed-solver',
+                       action='store_true',
+                       default=False,
+                       help='Keep eigensolver, mixer and threads of the preset '
+                            'instead of choosing them from the system size')
 
     submit = parser.add_argument_group('Submitting parameters',
                                        'Setting to create the sbatch script')
@@ -320,14 +656,99 @@ def _parser():
                          action='store',
                          default=None,
                          help='Set a title for the jobs otherwise it will be the name of the geometry file')
+    submit.add_argument('--submit-mode',
+                        action='store',
+                        default='array',
+                        choices=['array', 'loop'],
+                        help='Submit the DFTB+ clients as one job array or '
+                             'with one sbatch per replica')
+    submit.add_argument('--scheduler',
+                        action='store',
+                        default='slurm',
+                        choices=['slurm', 'pbs', 'local'],
+                        help='Scheduler running the jobs; local runs them on '
+                             'this machine, pinned on their own cores')
     submit.add_argument('--processors', '-p',
                         action='store',
                         default=1,
                         help='Number of process for each DFTB+ instance')
+    submit.add_argument('--single-job',
+                        action='store_true',
+                        default=False,
+                        help='Also write rem_single.sbatch, running i-PI, '
+                             'the DFTB+ clients and plumed in one allocation')
+    submit.add_argument('--ipi-exe',
+                        action='store',
+                        default='i-pi',
+                        help='Set the i-PI executable path (for --single-job)')
+    submit.add_argument('--chain',
+                        action='store_true',
+                        default=False,
+                        help='With --single-job: split the run in a chain of '
+                             'jobs, each one restarting i-PI from its last '
+                             'checkpoint')
+    submit.add_argument('--link-walltime',
+                        action='store',
+                        default=86400,
+                        type=int,
+                        help='Walltime (s) of each job of a chained run')
+    submit.add_argument('--cores-per-node',
+                        action='store',
+                        default=None,
+                        type=int,
+                        help='Cores of a node: if given, each job packs as '
+                             'many DFTB+ clients as fit in one node')
+    submit.add_argument('--stage-interval',
+                        action='store',
+                        default=600,
+                        type=int,
+                        help='Seconds between two copies of the scratch to '
+                             'the working directory while the jobs run '
+                             '(0 copies only at the end)')
+    submit.add_argument('--flush-timeout',
+                        action='store',
+                        default=60,
+                        type=int,
+                        help='Maximum duration (s) of the last copy at the '
+                             'end of a job')
+    submit.add_argument('--heartbeat',
+                        action='store',
+                        default=60,
+                        type=int,
+                        help='Seconds between two heartbeats of a DFTB+ '
+                             'client in replicas.db; after 5 missed beats '
+                             'runMany.sh restarts the replica')
+    submit.add_argument('--submit-timeout',
+                        action='store',
+                        default=3600,
+                        type=int,
+                        help='Seconds a submitted DFTB+ client may wait for '
+                             'its job to start before runMany.sh submits it '
+                             'again (the watchdog keeps the queued jobs)')
     submit.add_argument('--mem', '-m',
                         action='store',
-                        default=1000,
-                        help='Memeory requested for each DFTB+ instance')
+                        default='auto',
+                        help='Memeory requested for each DFTB+ instance (MB); '
+                             'auto estimates it from the number of orbitals')
+    submit.add_argument('--walltime',
+                        action='store',
+                        default='auto',
+                        help='Time limit of the DFTB+ jobs, in the format of '
+                             'the scheduler; auto estimates it from --nstep '
+                             'and --step-cost (without --step-cost, or with '
+                             'none, the default of the partition is left)')
+    submit.add_argument('--max-walltime',
+                        action='store',
+                        default=86400,
+                        type=int,
+                        help='Longest walltime (s) asked by auto, e.g. the '
+                             'time limit of the partition')
+    submit.add_argument('--step-cost',
+                        action='store',
+                        default=None,
+                        type=float,
+                        help='Seconds per MD step measured on a previous run: '
+                             'calibrates the walltime estimate')
 
     parser.add_argument('--version', '-v',
                         action='version',
@@ -15,6 +15,10 @@ a script with the right command to call plumed2.
 """
 import sys
 import os
+from slurm.backends import SlurmBackend
+from libs.io_geo import GeoIo
+from libs.io_pdb import PdbReader, PdbWriter
+from libs.bonds import BondPerception
 
 # Try determining the version from git:
 try:
@@ -35,27 +39,102 @@ __email__ = 'riccardo.petraglia@gmail.com'
 __status__ = 'development'
 
 class plumed2(object):
-    def __init__(self, xyzpath=None, options=None, home='/home/student'):
+    """The plumed2 input restraining the bonds, and its job script.
+
+    The bonds are the CONECT records of the .pdb next to the xyz file, which
+    has to describe the same atoms; if there is no .pdb they are found from
+    the coordinates (see libs.bonds). The structure given to plumed as
+    MOLINFO is written again at each run in the working directory
+    (NAME_molinfo.pdb), with the atoms of the geometry and the bonds
+    restrained: it is an output, never read back.
+
+    Args:
+        xyzpath: the geometry.
+        options: the options of the run (address and port_bias).
+        home: home directory on the cluster.
+        staging: StagingScript, or None.
+        backend: scheduler backend, slurm if None.
+        Geometry: the geometry already read (with its cell, if periodic);
+            xyzpath is read if None.
+        compact: restrain all the bonds with one DISTANCES multicolvar and
+            one bias instead of three actions per bond (needs the CUSTOM
+            switching functions of plumed 2.5 or later).
+
+    """
+    # The walls restraining each bond (Angstrom and kJ/mol)
+    upper_at = 1.4
+    upper_exp = 2
+    lower_at = 0.5
+    lower_exp = 12
+    kappa = 2000.0
+
+    def __init__(self, xyzpath=None, options=None, home='/home/student',
+                 staging=None, backend=None, Geometry=None, compact=False):
         self.options = options
-        self.pdbp = xyzpath[:-4]+'.pdb'
-        
+        self.staging = staging
+        self.compact = compact
+        if backend is None:
+            backend = SlurmBackend()
+        self.backend = backend
+        user_pdb = xyzpath[:-4] + '.pdb'
+        self.pdbp = os.path.basename(xyzpath[:-4]) + '_molinfo.pdb'
+
         self.connections = connectivity()
         self.home = home
-    
-        with open(self.pdbp) as pdbf:
-            for line in pdbf:
-                if line.find('CONECT') > -1:
-                    # print(line)
-                    atoms = line.split()[1:]
-                    for at in atoms[1:]:
-                        self.connections.add(atoms[0], at)
 
-    def write(self, outfile):
+        if Geometry is None:
+            Geometry = GeoIo()
+            Geometry.xyz_read(xyzpath)
+        if os.path.isfile(user_pdb):
+            reader = PdbReader(user_pdb).read()
+            reader.check(Geometry)
+            # Atoms numbered from 1, as plumed does
+            bonds = [(at1 - 1, at2 - 1) for at1, at2 in reader.bonds()]
+        else:
+            bonds = BondPerception(Geometry).bonds()
+        for at1, at2 in bonds:
+            self.connections.add(at1 + 1, at2 + 1)
+        PdbWriter(Geometry, bonds).write(self.pdbp)
+
+    def _bond_lines(self):
+        """One DISTANCE and a couple of walls for each bond."""
         distance_tmpl = 'DISTANCE ATOMS={at1:d},{at2:d} LABEL=b{at1:d}{at2:d}\n'
         # restraint_tmpl = 'RESTRAINT ARG=b{at1:d}{at2:d} AT=1.4 KAPPA=2000.0 LABEL=r{at1:d}{at2:d}\n'
         # Use UPPER AND LOWER WALLS instead of restreaint
         restraint_tmpl = 'UPPER_WALLS ARG=b{at1:d}{at2:d} AT=1.4 KAPPA=2000.0 EXP=2. EPS=1. OFFSET=0. LABEL=r{at1:d}{at2:d}-uw\nLOWER_WALLS ARG=b{at1:d}{at2:d} AT=.5 KAPPA=2000.0 EXP=12. EPS=1. OFFSET=0. LABEL=r{at1:d}{at2:d}-lw\n'
 
+        for at1, at2 in self.connections:
+            yield distance_tmpl.format(at1=at1, at2=at2)
+        yield '\n\n\n'
+        for at1, at2 in self.connections:
+            yield restraint_tmpl.format(at1=at1, at2=at2)
+
+    def _compact_lines(self):
+        """All the bonds in one DISTANCES and one bias.
+
+        The walls of _bond_lines are summed over the bonds by a custom
+        switching function of LESS_THAN (x is the length of a bond), so the
+        bias and its forces are the same as with one action per bond.
+
+        """
+        wall = '{kappa}*step(x-{upper})*(x-{upper})^{uexp}+' \
+               '{kappa}*step({lower}-x)*(x-{lower})^{lexp}'.format(
+                   kappa=self.kappa, upper=self.upper_at, uexp=self.upper_exp,
+                   lower=self.lower_at, lexp=self.lower_exp)
+        yield 'bonds: DISTANCES ...\n'
+        for i, (at1, at2) in enumerate(self.connections):
+            yield '   ATOMS{:d}={:d},{:d}\n'.format(i + 1, at1, at2)
+        yield '   LESS_THAN={{CUSTOM FUNC={} R_0=1. D_0=0.}}\n'.format(wall)
+        yield '...\n\n'
+        yield 'BIASVALUE ARG=bonds.lessthan LABEL=walls\n'
+
+    def actions(self):
+        """Return the number of actions of the input."""
+        if self.compact:
+            return 2 if len(self.connections) else 0
+        return 3 * len(self.connections)
+
+    def write(self, outfile):
         # Those will be at beginning og input file
         msg = '# Plumed input generated automatically by inputsGen\n'
         msg += 'UNITS LENGTH=.1 #Use Angstrom\n'
@@ -69,34 +148,43 @@ class plumed2(object):
         # msg += '# Set kappa for min distance between atoms\n'
         # msg += 'min_kappa: CONSTANT VALUE=2000.0\n\n'
 
-        for bond in self.connections:
-            msg += distance_tmpl.format(at1=bond.bond[0], at2=bond.bond[1])
-
-        msg += '\n\n\n'
-        for bond in self.connections:
-            msg += restraint_tmpl.format(at1=bond.bond[0], at2=bond.bond[1])
-
         with open(outfile, 'w') as outf:
-            outf.write(msg+'\n')
-
-        stderrpath = os.path.join(self.home, 'err', 'pippopluto_titlestderr_%j')
-        stdoutpath = os.path.join(self.home, 'err', 'pippopluto_titlestdout_%j')
+            outf.write(msg)
+            if self.compact:
+                outf.writelines(self._compact_lines())
+            else:
+                outf.writelines(self._bond_lines())
+            outf.write('\n')
+        if self.compact:
+            sys.stderr.write('plumed: {:d} bonds in {:d} actions instead of '
+                             '{:d}\n'.format(len(self.connections),
+                                             self.actions(),
+                                             3 * len(self.connections)))
+
+        stderrpath = self.backend.log_path(self.home, 'pippopluto_title',
+                                           'stderr')
+        stdoutpath = self.backend.log_path(self.home, 'pippopluto_title',
+                                           'stdout')
         msg = '#!/bin/bash\n'
-        msg += '#SBATCH -J plumed-pippopluto_title\n'
-        msg += '#SBATCH -e {:s}\n'.format(stderrpath)
-        msg += '#SBATCH -o {:s}\n'.format(stdoutpath)
-        msg += '#SBATCH --mem=1000\n'
-        msg += '#SBATCH --nodes=1\n'
-        msg += '#SBATCH --ntasks-per-node=1\n'
+        msg += self.backend.header('plumed-pippopluto_title', stderrpath,
+                                   stdoutpath, 1000, 1)
+        if self.staging is not None:
+            msg += self.backend.signal(self.staging.lead_time())
+        msg += self.backend.prologue()
+        if self.staging is not None:
+            msg += self.staging.write()
+            copy = 'stop_staging\n    final_flush $TMPDIR $WORKING_DIR'
+        else:
+            copy = 'rsync -ca $TMPDIR/ $WORKING_DIR/'
         msg += '\n'
 
         msg += '''
 
 WORKING_DIR=$PWD
-TMPDIR=$SLURM_TMPDIR
+TMPDIR={tmpdir}
 
 function coping_back() {
-    rsync -ca $TMPDIR/ $WORKING_DIR/
+    {copy}
     if [[ -e $WORKING_DIR/RUNNING_PLUMED.lock ]]; then
         rm -f $WORKING_DIR/RUNNING_PLUMED.lock
     fi
@@ -113,8 +201,13 @@ touch $WORKING_DIR/RUNNING_PLUMED.lock
 
 source /home/petragli/remd\@dftb3/set_remd\@dftb3.sh
 
-'''
+'''.replace('{copy}', copy).replace('{tmpdir}', self.backend.tmpdir)
+        if self.staging is not None:
+            msg += 'start_staging $TMPDIR $WORKING_DIR\n'
         msg += 'plumed socket --plumed {outfile:s} --host {address:s} --port {port:s} > $WORKING_DIR/plumed.out\n'.format(outfile=outfile, address=self.options['address'], port=str(self.options['port_bias']))
+        if self.staging is not None:
+            # In background, so that the TERM trap runs before the walltime
+            msg = msg[:-1] + ' &\nwait $!\n'
         msg += '\nexit\n'
 
         
@@ -122,39 +215,35 @@ source /home/petragli/remd\@dftb3/set_remd\@dftb3.sh
             outf.write(msg)
             
 
-class connection(object):
-    def __init__(self, at1, at2):
-        self.bond = [int(at1), int(at2)]
-        self.rbond = [int(at2), int(at1)]
-
-    def __eq__(self, other):
-#        print(other.bond)
-        if other.bond == self.bond or other.bond == self.rbond:
-            return True
-        else:
-            return False
+class connectivity(object):
+    """The bonds of a molecule, each one stored once.
 
-    def __str__(self):
-        msg = 'BOND1: {:4d} -- {:4d}\n'.format(self.bond[0], self.bond[1])
-        return msg
+    A bond is kept as the tuple (smaller index, larger index), so that the
+    bonds a-b and b-a are the same key. The dictionary keeps them in the order
+    they were added and checks the duplicates in constant time.
 
-    
-class connectivity(object):
+    """
     def __init__(self):
-        self.connectivity = []
+        self.bonds = {}
+
+    @staticmethod
+    def canonical(at1, at2):
+        at1, at2 = int(at1), int(at2)
+        return (at1, at2) if at1 <= at2 else (at2, at1)
 
     def add(self, at1, at2):
-        new = connection(at1, at2)
-        for con in self.connectivity:
-            if new == con: return
-        self.connectivity.append(new)
+        self.bonds.setdefault(self.canonical(at1, at2), None)
+
+    def __contains__(self, bond):
+        return self.canonical(*bond) in self.bonds
+
+    def __len__(self):
+        return len(self.bonds)
 
     def write(self):
-        msg = ''
-        for bond in self.connectivity:
-            msg += str(bond)
+        msg = ''.join('BOND1: {:4d} -- {:4d}\n'.format(*bond)
+                      for bond in self.bonds)
         print(msg)
 
     def __iter__(self):
-        return self.connectivity.__iter__()
-
+        return iter(self.bonds)
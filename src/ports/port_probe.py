@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: port_probe
+# Creation: Oct 19, 2026
+#
+
+"""Check the ports on the host where i-PI will listen.
+
+The good ports of port_for are the ones of the machine generating the
+inputs, while i-PI listens on --address, usually another host. Here the
+candidate ports are tried on that host with a connect attempt each, all of
+them at the same time (asyncio) and with a short timeout:
+
+refused
+    nobody listens on the port: it is free;
+accepted
+    somebody already listens on the port: it is busy;
+timeout or other errors
+    the host or a firewall did not answer: unknown.
+
+Example:
+    $ python3 port_probe.py 192.168.100.1 24000 24001 24002 --timeout 0.5
+
+"""
+
+import sys
+import socket
+import asyncio
+import argparse
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+FREE = 'free'
+BUSY = 'busy'
+UNKNOWN = 'unknown'
+
+
+async def _probe(host, port, timeout, limit):
+    async with limit:
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), timeout)
+        except ConnectionRefusedError:
+            return port, FREE
+        except (asyncio.TimeoutError, OSError):
+            return port, UNKNOWN
+        writer.close()
+        return port, BUSY
+
+
+async def _probe_all(host, ports, timeout, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*[_probe(host, port, timeout, limit)
+                                     for port in ports])
+    return dict(results)
+
+
+def probe_ports(host, ports, timeout=0.5, concurrency=256):
+    """Return a dictionary port -> FREE, BUSY or UNKNOWN.
+
+    Args:
+        host: the host i-PI will listen on.
+        ports: the candidate ports.
+        timeout: seconds to wait for each connection.
+        concurrency: connections attempted at the same time.
+
+    """
+    return asyncio.run(_probe_all(host, [int(p) for p in ports], timeout,
+                                  concurrency))
+
+
+def is_port_free(host, port, timeout=0.5):
+    return probe_ports(host, [port], timeout)[int(port)] == FREE
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        description='Check if some ports are free on a host.')
+    parser.add_argument('host')
+    parser.add_argument('ports', type=int, nargs='+')
+    parser.add_argument('--timeout', type=float, default=0.5)
+    return parser.parse_args()
+
+
+def main():
+    args = _parser()
+    try:
+        socket.gethostbyname(args.host)
+    except socket.error:
+        sys.stderr.write('Unknown host {}\n'.format(args.host))
+        sys.exit(1)
+    for port, state in sorted(probe_ports(args.host, args.ports,
+                                          args.timeout).items()):
+        print(port, state)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: port_registry
+# Creation: Oct 19, 2026
+#
+
+"""Registry of the ports leased to the simulations.
+
+A random free port is not enough when several inputs are generated at the
+same time: two runs can draw the same port and i-PI fails only later, on the
+cluster. The registry is a JSON file shared by all the runs of a user; it is
+locked (fcntl) while a port is handed out, so the same port is never given
+twice, and each lease expires after ttl seconds (the run is over by then).
+
+The set of the good ports of the machine (see port_for) is stored in the
+registry too, and computed again only once a day.
+
+Example:
+    $ python3 port_registry.py lease 2 --owner my_rem
+    $ python3 port_registry.py list
+    $ python3 port_registry.py release 24037 24038
+
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import random
+import argparse
+import contextlib
+
+# port_for is shipped with the package, as main.py does
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'port-for'))
+import port_for
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+REGISTRY = os.path.join(os.path.expanduser('~'), '.inputsGen_ports.json')
+
+
+class PortRegistry(object):
+    """Leases of ports, stored in a locked JSON file.
+
+    Args:
+        path: the registry file, created if missing.
+        ttl: lifetime (s) of a lease, 30 days by default.
+        rescan: age (s) after which the set of good ports is computed again.
+
+    """
+    def __init__(self, path=REGISTRY, ttl=30 * 86400, rescan=86400):
+        self.path = path
+        self.ttl = ttl
+        self.rescan = rescan
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Yield the content of the registry, saved back on exit."""
+        with open(self.path, 'a+') as regf:
+            fcntl.flock(regf, fcntl.LOCK_EX)
+            try:
+                regf.seek(0)
+                text = regf.read()
+                data = json.loads(text) if text.strip() else {}
+                data.setdefault('leases', {})
+                self._expire(data)
+                yield data
+                regf.seek(0)
+                regf.truncate()
+                json.dump(data, regf)
+                regf.flush()
+            finally:
+                fcntl.flock(regf, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _expire(data):
+        now = time.time()
+        for port, lease in list(data['leases'].items()):
+            if lease['expires'] < now:
+                del data['leases'][port]
+
+    def _good_ports(self, data):
+        """Return the cached set of good ports, refreshing it if too old."""
+        if time.time() - data.get('scanned', 0) > self.rescan or \
+                not data.get('good'):
+            data['good'] = sorted(port_for.available_good_ports())
+            data['scanned'] = time.time()
+        return set(data['good'])
+
+    def _new_lease(self, owner, ttl):
+        return dict(owner=owner or os.getcwd(),
+                    expires=time.time() + (ttl or self.ttl))
+
+    def lease(self, n=1, owner=None, ttl=None):
+        """Return n ports that nobody else holds and lease them.
+
+        Args:
+            n: number of ports.
+            owner: text stored with the lease (the working directory by
+                default).
+            ttl: lifetime (s) of the leases, self.ttl if None.
+
+        """
+        with self._locked() as data:
+            free = self._good_ports(data) - set(int(p) for p in data['leases'])
+            if len(free) < n:
+                raise PortsExhausted(n, len(free))
+            ports = random.sample(sorted(free), n)
+            for port in ports:
+                data['leases'][str(port)] = self._new_lease(owner, ttl)
+        return ports
+
+    def reserve(self, port, owner=None, ttl=None):
+        """Lease a given port; return False if it is not available.
+
+        A port already leased to the same owner is renewed: the inputs of a
+        run can be generated again with the same port.
+
+        """
+        lease = self._new_lease(owner, ttl)
+        with self._locked() as data:
+            held = data['leases'].get(str(port))
+            if held is not None and held['owner'] != lease['owner'] or \
+                    int(port) not in self._good_ports(data):
+                return False
+            data['leases'][str(port)] = lease
+        return True
+
+    def release(self, ports):
+        with self._locked() as data:
+            for port in ports:
+                data['leases'].pop(str(port), None)
+
+    def leases(self):
+        """Return the dictionary port -> lease of the active leases."""
+        with self._locked() as data:
+            return dict(data['leases'])
+
+    def is_leased(self, port):
+        return str(port) in self.leases()
+
+    def good_ports(self):
+        """Return the set of the good ports of the machine (see port_for).
+
+        The set cached in the registry is used, computed again only if it is
+        older than rescan.
+
+        """
+        with self._locked() as data:
+            return self._good_ports(data)
+
+
+class PortsExhausted(Exception):
+    def __init__(self, requested, available):
+        super().__init__('{} ports requested, only {} free'.format(
+            requested, available))
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        description='Lease and release the ports of the simulations.')
+    parser.add_argument('--registry', default=REGISTRY)
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    lease = commands.add_parser('lease', help='Lease N ports')
+    lease.add_argument('n', type=int, nargs='?', default=1)
+    lease.add_argument('--owner', default=None)
+    release = commands.add_parser('release', help='Release some ports')
+    release.add_argument('ports', type=int, nargs='+')
+    commands.add_parser('list', help='Print the active leases')
+    return parser.parse_args()
+
+
+def main():
+    args = _parser()
+    registry = PortRegistry(args.registry)
+    if args.command == 'lease':
+        for port in registry.lease(args.n, args.owner):
+            print(port)
+    elif args.command == 'release':
+        registry.release(args.ports)
+    elif args.command == 'list':
+        for port, lease in sorted(registry.leases().items()):
+            sys.stdout.write('{:>6s} {} {}\n'.format(
+                port, time.strftime('%Y-%m-%d', time.localtime(
+                    lease['expires'])), lease['owner']))
+
+
+if __name__ == '__main__':
+    main()
@@ -37,7 +37,9 @@ Attributes:
 
 """
 
-import port_for
+import sys
+from ports.port_registry import PortRegistry
+from ports.port_probe import probe_ports, FREE, UNKNOWN
 
 # Try determining the version from git:
 try:
@@ -60,11 +62,45 @@ __status__ = 'development'
 def giveme_a_port():
     """Return a random port.
 
-    Using the port-for method to guess a free port on the localhost.
+    The port is leased in the port registry, so that no other run gets it.
 
     """
-    port = port_for.select_random()
-    return port
+    return giveme_ports(1)[0]
+
+
+def giveme_ports(n, owner=None, host=None, timeout=0.5, attempts=5):
+    """Return n different ports, all leased in one go.
+
+    If host is given, more ports than needed are leased and probed on host
+    (see port_probe); the first n free ones are kept and the others released.
+    If host never answers the ports are returned unverified.
+
+    Args:
+        n: number of ports.
+        owner: description of the run stored with the leases.
+        host: the host where the ports will be opened.
+        timeout: seconds to wait for each probe.
+        attempts: rounds of probes before giving up.
+
+    """
+    registry = PortRegistry()
+    if host is None:
+        return registry.lease(n, owner)
+    ports = []
+    for _ in range(attempts):
+        leased = registry.lease(4 * (n - len(ports)), owner)
+        states = probe_ports(host, leased, timeout)
+        if all(state == UNKNOWN for state in states.values()):
+            sys.stderr.write('WARNING: {} does not answer, the ports are not '
+                             'verified\n'.format(host))
+            ports += leased[:n - len(ports)]
+        else:
+            ports += [p for p in leased if states[p] == FREE][:n - len(ports)]
+        registry.release([p for p in leased if p not in ports])
+        if len(ports) == n:
+            return ports
+    registry.release(ports)
+    raise ValueError('Cannot find {} free ports on {}'.format(n, host))
 
 
 def is_port_free(port):
@@ -76,11 +112,11 @@ def is_port_free(port):
         port: the number of the port you want to check.
 
     """
-    cond = int(port) in port_for.available_good_ports()
+    registry = PortRegistry()
+    cond = int(port) in registry.good_ports() and \
+        not registry.is_leased(port)
     return cond
 
-    return
-
 
 
 if __name__ == '__main__':
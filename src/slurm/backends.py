@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: backends
+# Creation: Oct 19, 2026
+#
+
+"""Scheduler backends used to write and submit the job scripts.
+
+The job scripts (SbatchDftbScript, plumed2) and the scripts submitting them
+(runManyDftbScript, runManyPlumedScript) only ask the backend for the
+scheduler specific pieces: the directives of the header, the environment
+variables set by the scheduler and the submission commands. Three backends
+are available:
+
+slurm
+    the default, jobs submitted with sbatch;
+pbs
+    PBS Pro / Torque, jobs submitted with qsub;
+local
+    no scheduler: the jobs run on this machine as subprocesses of
+    slurm/local_executor.py, each one pinned on its own cores.
+
+"""
+
+import os
+import signal
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+def format_walltime(walltime):
+    """Return walltime as HH:MM:SS.
+
+    Args:
+        walltime: seconds, or a string that is returned as it is.
+
+    """
+    if isinstance(walltime, str):
+        return walltime
+    minutes, seconds = divmod(int(walltime), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{:02d}:{:02d}:{:02d}'.format(hours, minutes, seconds)
+
+
+class SchedulerBackend(object):
+    """Interface of the scheduler backends.
+
+    Attributes:
+        name: name of the backend (--scheduler option).
+        tmpdir: shell expression of the local scratch of the job.
+        submit_dir: shell expression of the directory the job was
+            submitted from.
+        task_id: shell expression of the index of an array task.
+        job_id: shell expression of the id of the running job.
+
+    """
+    name = None
+    tmpdir = None
+    submit_dir = None
+    task_id = None
+    job_id = None
+
+    def log_path(self, home, title, stream, array=False):
+        """Path of the stdout or stderr (stream) of a job, None if unused."""
+        raise NotImplementedError
+
+    def header(self, title, stderr, stdout, mem, ntasks_per_node,
+               cpus_per_task=None, walltime=None):
+        """Directives requesting the resources of a job on one node.
+
+        Args:
+            title: name of the job.
+            stderr: path of the stderr (see log_path).
+            stdout: path of the stdout (see log_path).
+            mem: memory of the job (MB).
+            ntasks_per_node: tasks of the job.
+            cpus_per_task: cores of each task, None if not specified.
+            walltime: time limit (see format_walltime), None if not
+                specified.
+
+        """
+        raise NotImplementedError
+
+    def prologue(self):
+        """Commands run before anything else in the job script."""
+        return ''
+
+    def signal(self, seconds):
+        """Directive asking a TERM to the batch shell before the walltime."""
+        return ''
+
+    def launcher(self, threads):
+        """Command prefix starting one of the clients packed in a job."""
+        return ''
+
+    def submit_job(self, script, env=None, parsable=False):
+        """Command submitting script.
+
+        Args:
+            script: the job script.
+            env: NAME=VALUE variable exported to the job, if any.
+            parsable: the command prints only the id of the job, as
+                job_alive expects it.
+
+        """
+        raise NotImplementedError
+
+    def submit_array(self, script, indexes='$jobs', parsable=False):
+        """Command submitting script once for each of the indexes.
+
+        The indexes are a shell expression expanding to a comma separated
+        list; each job finds its index in task_id. If parsable, the command
+        prints one line "INDEX JOB_ID" for each index, the id as job_alive
+        expects it.
+
+        """
+        raise NotImplementedError
+
+    def job_alive(self, job_id):
+        """True if the job is pending or running, None if unknown."""
+        raise NotImplementedError
+
+    def cancel(self, job_id):
+        """Cancel the job."""
+        raise NotImplementedError
+
+    @staticmethod
+    def _query(command):
+        """Return (exit status, output) of command, None if it is missing."""
+        try:
+            proc = subprocess.run(command, stdout=subprocess.PIPE,
+                                  stderr=subprocess.DEVNULL,
+                                  universal_newlines=True)
+        except OSError:
+            return None
+        return proc.returncode, proc.stdout
+
+
+class SlurmBackend(SchedulerBackend):
+    name = 'slurm'
+    tmpdir = '$SLURM_TMPDIR'
+    submit_dir = '$SLURM_SUBMIT_DIR'
+    task_id = '$SLURM_ARRAY_TASK_ID'
+    job_id = '$SLURM_JOB_ID'
+
+    def log_path(self, home, title, stream, array=False):
+        jobid = '%A_%a' if array else '%j'
+        return os.path.join(home, 'err',
+                            os.path.basename(str(title)) + stream + '_' + jobid)
+
+    def header(self, title, stderr, stdout, mem, ntasks_per_node,
+               cpus_per_task=None, walltime=None):
+        msg = '#SBATCH -J {}\n'.format(title)
+        msg += '#SBATCH -e {}\n'.format(stderr)
+        msg += '#SBATCH -o {}\n'.format(stdout)
+        msg += '#SBATCH --mem={}\n'.format(mem)
+        msg += '#SBATCH --nodes=1\n'
+        msg += '#SBATCH --ntasks-per-node={}\n'.format(ntasks_per_node)
+        if cpus_per_task is not None:
+            msg += '#SBATCH --cpus-per-task={}\n'.format(cpus_per_task)
+        if walltime is not None:
+            msg += '#SBATCH --time={}\n'.format(format_walltime(walltime))
+        return msg
+
+    def signal(self, seconds):
+        return '#SBATCH --signal=B:TERM@{:d}\n'.format(seconds)
+
+    def launcher(self, threads):
+        return 'srun --exclusive --nodes=1 --ntasks=1 --cpus-per-task={} ' \
+               '--cpu-bind=cores '.format(threads)
+
+    def submit_job(self, script, env=None, parsable=False):
+        # --parsable prints JOBID[;CLUSTER]
+        options = ' --parsable' if parsable else ''
+        if env is not None:
+            options += ' --export=ALL,{}'.format(env)
+        command = 'sbatch{} {}'.format(options, script)
+        if parsable:
+            command += ' | cut -d";" -f1'
+        return command
+
+    def submit_array(self, script, indexes='$jobs', parsable=False):
+        if not parsable:
+            return 'sbatch --array={} {}'.format(indexes, script)
+        # The tasks of an array are known to squeue as JOBID_INDEX
+        return 'array_id=$(sbatch --parsable --array={0} {1} | ' \
+               'cut -d";" -f1); [[ -n $array_id ]] && ' \
+               'for index in ${{{2}//,/ }}; do ' \
+               'echo $index ${{array_id}}_$index; done'.format(
+                   indexes, script, indexes.lstrip('$'))
+
+    def job_alive(self, job_id):
+        # squeue -h lists only the pending and running jobs
+        result = self._query(['squeue', '-h', '-j', str(job_id), '-o', '%T'])
+        if result is None:
+            return None
+        return result[0] == 0 and bool(result[1].strip())
+
+    def cancel(self, job_id):
+        self._query(['scancel', str(job_id)])
+
+
+class PbsBackend(SchedulerBackend):
+    """PBS backend.
+
+    PBS arrays only accept ranges of indexes, so the "array" is submitted as
+    one job per index, each one receiving its index in ARRAY_TASK_ID. The
+    clients packed in a job are not bound to their cores.
+
+    """
+    name = 'pbs'
+    tmpdir = '$TMPDIR'
+    submit_dir = '$PBS_O_WORKDIR'
+    task_id = '$ARRAY_TASK_ID'
+    job_id = '$PBS_JOBID'
+
+    def log_path(self, home, title, stream, array=False):
+        # PBS does not expand the job id in the directives: the files are
+        # named after the job in this directory
+        return os.path.join(home, 'err', '')
+
+    def header(self, title, stderr, stdout, mem, ntasks_per_node,
+               cpus_per_task=None, walltime=None):
+        ncpus = int(ntasks_per_node) * int(cpus_per_task or 1)
+        msg = '#PBS -N {}\n'.format(title)
+        msg += '#PBS -e {}\n'.format(stderr)
+        msg += '#PBS -o {}\n'.format(stdout)
+        msg += '#PBS -l select=1:ncpus={:d}:mem={}mb\n'.format(ncpus, mem)
+        if walltime is not None:
+            msg += '#PBS -l walltime={}\n'.format(format_walltime(walltime))
+        return msg
+
+    def prologue(self):
+        return 'cd $PBS_O_WORKDIR\n'
+
+    def submit_job(self, script, env=None, parsable=False):
+        # qsub prints only the id of the job anyway
+        if env is None:
+            return 'qsub {}'.format(script)
+        return 'qsub -v {} {}'.format(env, script)
+
+    def submit_array(self, script, indexes='$jobs', parsable=False):
+        qsub = 'qsub -v ARRAY_TASK_ID=$index {}'.format(script)
+        if parsable:
+            qsub = 'echo $index $({})'.format(qsub)
+        return 'for index in ${{{}//,/ }}; do {}; done'.format(
+            indexes.lstrip('$'), qsub)
+
+    def job_alive(self, job_id):
+        # qstat fails for the jobs that are over
+        result = self._query(['qstat', str(job_id)])
+        if result is None:
+            return None
+        return result[0] == 0
+
+    def cancel(self, job_id):
+        self._query(['qdel', str(job_id)])
+
+
+class LocalBackend(SchedulerBackend):
+    """Run the jobs on this machine through slurm/local_executor.py.
+
+    An executor is started in background for each submission and runs the
+    jobs on cpus_per_task cores each. The cores are locked through files
+    shared by all the executors, so the jobs of different submissions (e.g.
+    plumed, the dftb+ array and the resubmissions of the watchdog) never run
+    on the same cores.
+
+    Args:
+        executor: path of local_executor.py.
+        cpus_per_task: cores given to each job.
+
+    """
+    name = 'local'
+    tmpdir = '$LOCAL_TMPDIR'
+    submit_dir = '$LOCAL_SUBMIT_DIR'
+    task_id = '$LOCAL_TASK_ID'
+    job_id = '$$'
+
+    def __init__(self, executor, cpus_per_task=1):
+        self.executor = executor
+        self.cpus_per_task = cpus_per_task
+
+    def log_path(self, home, title, stream, array=False):
+        return None
+
+    def header(self, title, stderr, stdout, mem, ntasks_per_node,
+               cpus_per_task=None, walltime=None):
+        return '# Job {} run by the local executor\n'.format(title)
+
+    def _executor(self, script, options, report):
+        # Each submission logs in its own file: the executors started by
+        # runMany.sh and by the watchdog run at the same time
+        log = 'local_executor-{}-XXXXXX.log'.format(
+            os.path.splitext(os.path.basename(script))[0])
+        return 'nohup python3 {} --cpus-per-task {:d} {} {} ' \
+               '> $(mktemp {}) 2>&1 & {}'.format(
+                   self.executor, int(self.cpus_per_task), options, script,
+                   log, report)
+
+    def submit_job(self, script, env=None, parsable=False):
+        options = '--tasks 1'
+        if env is not None:
+            options += ' --env {}'.format(env)
+        # The executor is alive as long as its jobs
+        report = 'echo $!' if parsable else \
+            'echo "Local executor started (pid $!)"'
+        return self._executor(script, options, report)
+
+    def submit_array(self, script, indexes='$jobs', parsable=False):
+        report = 'echo "Local executor started (pid $!)"'
+        if parsable:
+            report = 'for index in ${{{}//,/ }}; do echo $index $!; ' \
+                     'done'.format(indexes.lstrip('$'))
+        return self._executor(script, '--tasks {}'.format(indexes), report)
+
+    def job_alive(self, job_id):
+        # The id of a local job is the pid of its script, or of the
+        # executor running it
+        try:
+            os.kill(int(job_id), 0)
+        except ProcessLookupError:
+            return False
+        except (OSError, ValueError):
+            return None
+        return True
+
+    def cancel(self, job_id):
+        try:
+            os.kill(int(job_id), signal.SIGTERM)
+        except (OSError, ValueError):
+            pass
+
+
+BACKENDS = dict(slurm=SlurmBackend, pbs=PbsBackend, local=LocalBackend)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: local_executor
+# Creation: Oct 19, 2026
+#
+
+"""Run the job scripts on this machine, without a scheduler.
+
+The executor plays the role of the scheduler for the local backend (see
+slurm/backends.py): it runs a job script once for each task index, at most as
+many at the same time as fit in the cores of the machine. Each job is pinned
+(sched_setaffinity) on its own cores, which are inherited by everything the
+script starts, and gets the variables the scheduler would set::
+
+    LOCAL_TASK_ID     index of the task
+    LOCAL_TMPDIR      private scratch directory, removed at the end
+    LOCAL_SUBMIT_DIR  directory the executor was started from
+    LOCAL_CPUS        cores of the job
+
+Example:
+    $ python3 local_executor.py --cpus-per-task 2 --tasks 1,2,3 dftb.array.sh
+
+The output of each job goes to local-SCRIPT-TASK.log; the executor returns
+once all the jobs are over, with a non zero exit status if any of them
+failed.
+
+Every submission starts its own executor (plumed, the dftb+ array, the jobs
+resubmitted by the watchdog), so the cores are not owned by an executor: each
+core has a lock file (flock) in a directory shared by all the executors of
+the user, and a job starts only once it holds the locks of all its cores. The
+locks are released by the kernel if an executor dies.
+
+"""
+
+import os
+import sys
+import time
+import fcntl
+import random
+import shutil
+import tempfile
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+# Lock files of the cores, shared by all the executors of the user
+LOCK_DIR = os.path.join(tempfile.gettempdir(),
+                        'inputsGen-cores-{:d}'.format(os.getuid()))
+
+
+class CoreAllocator(object):
+    """Cores of the machine shared between processes through lock files.
+
+    Args:
+        cores: the cores that may be allocated.
+        lockdir: directory of the lock files, one per core.
+        poll: seconds between two attempts when not enough cores are free.
+
+    """
+    def __init__(self, cores, lockdir=LOCK_DIR, poll=1.0):
+        self.cores = sorted(cores)
+        self.lockdir = lockdir
+        self.poll = poll
+        # The threads of one process take the cores one at a time
+        self.lock = threading.Lock()
+        os.makedirs(lockdir, exist_ok=True)
+
+    def _try_lock(self, core):
+        lockf = open(os.path.join(self.lockdir, 'cpu{:d}.lock'.format(core)),
+                     'a')
+        try:
+            fcntl.flock(lockf, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lockf.close()
+            return None
+        return lockf
+
+    def acquire(self, ncores):
+        """Wait for ncores free cores and lock them.
+
+        Returns:
+            A dictionary core: lock file, to be given back to release.
+
+        """
+        ncores = min(max(1, int(ncores)), len(self.cores))
+        while True:
+            held = {}
+            with self.lock:
+                for core in self.cores:
+                    lockf = self._try_lock(core)
+                    if lockf is not None:
+                        held[core] = lockf
+                        if len(held) == ncores:
+                            return held
+                self.release(held)
+            # Random wait, so that two processes do not keep taking half of
+            # the free cores each
+            time.sleep(self.poll * (0.5 + random.random()))
+
+    @staticmethod
+    def release(held):
+        for lockf in held.values():
+            fcntl.flock(lockf, fcntl.LOCK_UN)
+            lockf.close()
+
+
+class LocalExecutor(object):
+    """Pool of jobs pinned on disjoint sets of cores.
+
+    The cores are taken from a CoreAllocator, so the jobs of different
+    executors running at the same time do not share their cores either.
+
+    Args:
+        cpus_per_task: cores given to each job; a task larger than the
+            machine gets all its cores.
+        cpus: number of cores the executor may use, all the cores this
+            process may run on if None.
+        lockdir: directory of the lock files of the cores.
+
+    """
+    def __init__(self, cpus_per_task=1, cpus=None, lockdir=LOCK_DIR):
+        available = sorted(os.sched_getaffinity(0))
+        if cpus is not None:
+            available = available[:int(cpus)]
+        self.cpus_per_task = min(max(1, int(cpus_per_task)), len(available))
+        self.nslots = max(1, len(available) // self.cpus_per_task)
+        self.allocator = CoreAllocator(available, lockdir)
+
+    def _run(self, script, task, env):
+        held = self.allocator.acquire(self.cpus_per_task)
+        cores = set(held)
+        tmpdir = tempfile.mkdtemp(prefix='local-{}-'.format(task))
+        job_env = dict(os.environ)
+        job_env.update(env)
+        job_env.update(LOCAL_TASK_ID=str(task),
+                       LOCAL_TMPDIR=tmpdir,
+                       LOCAL_SUBMIT_DIR=os.getcwd(),
+                       LOCAL_CPUS=','.join(str(c) for c in sorted(cores)))
+        log = 'local-{}-{}.log'.format(os.path.basename(script), task)
+        try:
+            with open(log, 'w') as logf:
+                proc = subprocess.Popen(
+                    ['bash', script], env=job_env, stdout=logf,
+                    stderr=subprocess.STDOUT,
+                    preexec_fn=lambda: os.sched_setaffinity(0, cores))
+                return proc.wait()
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            self.allocator.release(held)
+
+    def run(self, script, tasks, env=None):
+        """Run script once for each task and return their exit status.
+
+        Args:
+            script: the job script, run with bash.
+            tasks: the task indexes.
+            env: dictionary of variables exported to all the jobs.
+
+        """
+        env = env or {}
+        with ThreadPoolExecutor(max_workers=self.nslots) as pool:
+            futures = [(task, pool.submit(self._run, script, task, env))
+                       for task in tasks]
+            return dict((task, future.result()) for task, future in futures)
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        description='Run a job script on this machine, once per task.')
+    parser.add_argument('script',
+                        help='The job script')
+    parser.add_argument('--tasks',
+                        default='1',
+                        help='Comma separated task indexes (ranges as 1-4 '
+                             'are accepted)')
+    parser.add_argument('--cpus-per-task',
+                        type=int,
+                        default=1,
+                        help='Cores pinned to each job')
+    parser.add_argument('--cpus',
+                        type=int,
+                        default=None,
+                        help='Cores the executor may use (default: all)')
+    parser.add_argument('--lock-dir',
+                        default=LOCK_DIR,
+                        help='Lock files of the cores, shared by the '
+                             'executors running at the same time')
+    parser.add_argument('--env',
+                        action='append',
+                        default=[],
+                        help='NAME=VALUE exported to the jobs (repeatable)')
+    return parser.parse_args()
+
+
+def _tasks(text):
+    tasks = []
+    for item in text.split(','):
+        if not item:
+            continue
+        first, _, last = item.partition('-')
+        tasks.extend(range(int(first), int(last or first) + 1))
+    return tasks
+
+
+def main():
+    args = _parser()
+    env = dict(item.split('=', 1) for item in args.env)
+    executor = LocalExecutor(args.cpus_per_task, args.cpus, args.lock_dir)
+    status = executor.run(args.script, _tasks(args.tasks), env)
+    failed = [task for task, code in status.items() if code != 0]
+    for task in failed:
+        sys.stderr.write('Task {} exited with status {}\n'.format(
+            task, status[task]))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: make_allinone
+# Creation: Oct 19, 2026
+#
+
+"""Create one sbatch file running i-PI, all the dftb+ clients and plumed.
+
+The server and its clients are started in the same allocation: there is no
+queue skew between them and the clients talk to a server that sits in the
+same cluster network. The address of the server is only known once the job
+runs, so the script resolves it at runtime and patches ipi_input.xml and the
+dftb+ inputs before starting anything.
+
+Runs longer than the walltime limit are split in a chain of links. Each link
+queues the next one as soon as it starts (--dependency=afterany), so that
+there is no gap between them. i-PI stops by itself before the walltime
+(total_time in its input), the next link restarts it from the most recent
+of its RESTART and checkpoint files and starts new clients, which connect to
+the new address. The chain stops once i-PI reached total_steps.
+
+"""
+
+import os
+from slurm.make_runMany import REPLICA_DIR
+from slurm.backends import format_walltime
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+class SbatchAllInOneScript(object):
+    """Sbatch file starting the i-PI server together with its clients.
+
+    The batch script itself runs on the first node of the allocation and
+    hosts the i-PI server (one task). Each dftb+ client and the optional
+    plumed client are started with srun as separate job steps.
+
+    Args:
+        title: title of the job.
+        nreps: number of dftb+ clients (replicas).
+        threads: threads of each dftb+ client.
+        mem: memory (MB) of each dftb+ client.
+        port: port of the dftb+ ffsocket.
+        address: name of the socket if isUnix (an inet address is resolved
+            when the job starts).
+        port_bias: port of the plumed ffsocket, None if there is no bias.
+        isUnix: True if i-PI opens a unix socket; all the tasks then have to
+            be on the node of the server.
+        hsd_filename: printf-like pattern of the per-replica dftb+ inputs,
+            None if all the clients use dftb_in.hsd.
+        natom: number of atoms, used to validate the charges.bin.
+        charges_checker: path of the dftbp/charges.py script.
+        executable: dftb+ executable.
+        ipi_executable: i-PI executable.
+        home: home directory (stdout and stderr go in home/err).
+        walltime: time limit of the job (seconds or a SLURM time string),
+            None to use the default of the partition.
+        chain_links: if given, the job is a link of a chain of at most
+            chain_links jobs (see the module documentation).
+        filename: name of the sbatch file, submitted again by the chain.
+        release: command run once the whole run is over (e.g. releasing the
+            ports in the port registry), None for nothing.
+
+    """
+    def __init__(self, title='remJob', nreps=1, threads=1, mem=1000,
+                 port=None, address=None, port_bias=None, isUnix=False,
+                 hsd_filename=None, natom=None, charges_checker=None, executable='dftb+',
+                 ipi_executable='i-pi', home='/home/student', walltime=None,
+                 chain_links=None, filename='rem_single.sbatch',
+                 release=None):
+        self.title = os.path.basename(str(title))
+        self.nreps = int(nreps)
+        self.threads = int(threads)
+        self.mem = int(mem)
+        self.port = port
+        self.address = address
+        self.port_bias = port_bias
+        self.isUnix = isUnix
+        self.hsd_filename = hsd_filename
+        self.natom = natom
+        self.charges_checker = charges_checker
+        self.stderr = os.path.join(home, 'err', self.title + 'stderr_%j')
+        self.stdout = os.path.join(home, 'err', self.title + 'stdout_%j')
+        self.server_timeout = 120
+        self.walltime = walltime
+        self.chain_links = chain_links
+        self.filename = filename
+        self.release = release
+
+        self.config = dict(
+            sources=['intel/15.0.3',],
+            bin=executable,
+            ipi=ipi_executable,
+        )
+
+    def _header(self):
+        ntasks = self.nreps + 1
+        if self.port_bias is not None:
+            ntasks += 1
+        msg = '#!/bin/bash\n'
+        msg += '#SBATCH -J {}\n'.format(self.title)
+        msg += '#SBATCH -e {}\n'.format(self.stderr)
+        msg += '#SBATCH -o {}\n'.format(self.stdout)
+        msg += '#SBATCH --ntasks={:d}\n'.format(ntasks)
+        msg += '#SBATCH --cpus-per-task={:d}\n'.format(self.threads)
+        msg += '#SBATCH --mem-per-cpu={:d}\n'.format(
+            max(1, self.mem // self.threads))
+        if self.walltime is not None:
+            msg += '#SBATCH --time={}\n'.format(
+                format_walltime(self.walltime))
+        if self.isUnix:
+            msg += '#SBATCH --nodes=1\n'
+        msg += '\n'
+        for s in self.config['sources']:
+            msg += 'module load {:s}\n'.format(s)
+        return msg
+
+    def _server(self):
+        """Resolve the address, patch the inputs and start i-PI."""
+        if self.isUnix:
+            address = """# Unix socket: everything runs on this node
+wait_server() {{
+    [[ -S /tmp/ipi_{address} ]]
+}}
+""".format(address=self.address)
+        else:
+            address = """# The server runs on this node: use its address
+ADDRESS=`hostname -I | awk '{{print $1}}'`
+echo "i-PI server on $ADDRESS"
+sed -i "s|<address>[^<]*</address>|<address> $ADDRESS </address>|g" {ipi_input}
+wait_server() {{
+    ss -ltn | grep -q ":{port} "
+}}
+""".format(ipi_input='$IPI_INPUT', port=self.port)
+
+        return """
+WORKING_DIR=$SLURM_SUBMIT_DIR
+cd $WORKING_DIR
+IPI_INPUT=ipi_input.xml
+{chain}
+{address}
+{ipi} $IPI_INPUT {redirect} ipi.out 2>&1 &
+IPI_PID=$!
+
+for t in `seq 1 {timeout}`; do
+    wait_server && break
+    sleep 1
+done
+if ! wait_server; then
+    echo "i-PI did not open its socket in {timeout} s" >&2
+    kill $IPI_PID
+    exit 1
+fi
+""".format(address=address, ipi=self.config['ipi'],
+           timeout=self.server_timeout, chain=self._chain(),
+           redirect='>' if self.chain_links is None else '>>')
+
+    def _chain(self):
+        """Queue the next link and restart i-PI from its last checkpoint."""
+        if self.chain_links is None:
+            return ''
+        unix_socket = ''
+        if self.isUnix:
+            unix_socket = '    rm -f /tmp/ipi_{}\n'.format(self.address)
+        return """
+# Chained run: link $CHAIN_LINK of at most {links}
+CHAIN_LINK=${{CHAIN_LINK:-1}}
+NEXT_LINK=''
+
+ipi_finished() {{
+    python3 -c "import sys, xml.etree.ElementTree as et
+r = et.parse(sys.argv[1]).getroot()
+sys.exit(int(r.find('step').text) < int(r.find('total_steps').text) - 1)" $1
+}}
+
+LATEST=`ls -t RESTART checkpoint 2>/dev/null | head -1`
+if [[ -n $LATEST ]]; then
+    if ipi_finished $LATEST; then
+        echo "i-PI already reached total_steps"
+        touch CHAIN.done
+{release}        exit 0
+    fi
+    echo "Restarting i-PI from $LATEST"
+    cp -f $LATEST ipi_restart.xml
+    IPI_INPUT=ipi_restart.xml
+{unix_socket}fi
+
+if [[ $CHAIN_LINK -lt {links} ]]; then
+    NEXT_LINK=`sbatch --parsable --dependency=afterany:$SLURM_JOB_ID \\
+        --export=ALL,CHAIN_LINK=$(( CHAIN_LINK + 1 )) {filename}`
+    echo "Link $(( CHAIN_LINK + 1 )) queued as job $NEXT_LINK"
+fi
+""".format(links=int(self.chain_links), filename=self.filename,
+           unix_socket=unix_socket, release=self._release('        '))
+
+    def _chain_end(self):
+        """Stop the chain once i-PI is over."""
+        if self.chain_links is None:
+            return ''
+        return """
+# Nothing left for the next link
+if [[ -e RESTART ]] && ipi_finished RESTART; then
+    touch CHAIN.done
+    if [[ -n $NEXT_LINK ]]; then
+        scancel $NEXT_LINK
+    fi
+{release}fi
+""".format(release=self._release('    '))
+
+    def _release(self, indent):
+        """Return the release command as a line of script."""
+        if self.release is None:
+            return ''
+        return indent + self.release + '\n'
+
+    def _clients(self):
+        """Prepare each REM directory and start the dftb+ clients."""
+        if self.hsd_filename is None:
+            copy_input = 'cp -f dftb_in.hsd $name/dftb_in.hsd'
+        else:
+            copy_input = \
+                'cp -f `printf \'{}\' $i` $name/dftb_in.hsd'.format(
+                    self.hsd_filename)
+        patch_host = ''
+        if not self.isUnix:
+            patch_host = \
+                '    sed -i "s/Host = .*/Host = $ADDRESS /" $name/dftb_in.hsd\n'
+        read_charges = ''
+        if self.natom is not None and self.charges_checker is not None:
+            read_charges = """    if python3 {checker} $name/charges.bin {natom}; then
+        sed -i 's/ReadInitialCharges = No/ReadInitialCharges = Yes/' $name/dftb_in.hsd
+    fi
+""".format(checker=self.charges_checker, natom=self.natom)
+
+        return """
+export OMP_NUM_THREADS={threads}
+STEP="srun --exclusive --nodes=1 --ntasks=1 --cpus-per-task={threads} --cpu-bind=cores"
+
+for i in `seq 1 {nreps}`; do
+    name=`printf '{replica_dir}' $i`
+    mkdir -p $name
+    {copy_input}
+{patch_host}{read_charges}    $STEP --chdir=$name {bin} dftb_in.hsd > $name/dftb.out 2>&1 &
+done
+""".format(threads=self.threads, nreps=self.nreps, replica_dir=REPLICA_DIR,
+           copy_input=copy_input, patch_host=patch_host,
+           read_charges=read_charges, bin=self.config['bin'])
+
+    def _bias(self):
+        """Start the plumed client, if any."""
+        if self.port_bias is None:
+            return ''
+        return """
+srun --exclusive --nodes=1 --ntasks=1 --cpus-per-task=1 plumed socket --plumed plumed.dat --host $ADDRESS --port {port} > plumed.out 2>&1 &
+""".format(port=self.port_bias)
+
+    def write(self):
+        """Return the sbatch file as a string."""
+        msg = self._header() + self._server() + self._clients() + \
+            self._bias()
+        msg += """
+# The clients leave as soon as the server closes the sockets
+wait $IPI_PID
+wait
+"""
+        if self.chain_links is None:
+            msg += self._release('')
+        msg += self._chain_end()
+        msg += '\nexit\n'
+        return msg
@@ -37,6 +37,8 @@ Attributes:
 
 """
 
+from slurm.backends import SlurmBackend
+
 # Try determining the version from git:
 try:
     import subprocess
@@ -56,25 +58,140 @@ __email__ = 'riccardo.petraglia@gmail.com'
 __status__ = 'development'
 
 
+# Name of the directory of each replica, printf-like (replicas start from 1)
+REPLICA_DIR = 'REM-%03i'
+
+
 class runManyDftbScript(object):
+    """Script to start (or restart) all the dftb+ clients of a REM.
+
+    Args:
+        nreps: number of replicas.
+        title: title of the jobs.
+        sbatch_filename: sbatch template to be submitted for each replica.
+        hsd_filename: printf-like pattern of the per-replica dftb+ input. If
+            None all the replicas share ../dftb_in.hsd.
+        array: if True the free replicas are submitted as one job array
+            (the sbatch template has to be written for arrays, see
+            SbatchDftbScript) instead of one sbatch per replica.
+
+        clients_per_job: number of clients packed in each job. The replicas
+            are grouped in ceil(nreps / clients_per_job) jobs: job p runs the
+            replicas from (p - 1) * clients_per_job + 1 to p * clients_per_job.
+        backend: scheduler backend submitting the jobs (see slurm.backends),
+            SLURM by default.
+        replica_db: the replica database, if any.
+        replica_tool: path of the slurm/replica_db.py script.
+        stale: seconds without heartbeat after which a running replica is
+            considered dead.
+        submit_timeout: seconds after which a submitted replica whose job
+            did not start is considered dead.
+
+    Note:
+        Without database, a replica is (re)started only if its directory does
+        not contain the RUNNING_DFTBP.lock file. With the database, the
+        replicas to restart come from one query (see replica_db.py claim),
+        so a lock left behind by a killed job does not block its replica;
+        replica numbers given as arguments of the script restrict the
+        restart to them (this is how the watchdog resubmits). The id of each
+        submitted job is recorded in the database (replica_db.py submitted).
+        With packed jobs, a job is resubmitted only when none of its replicas
+        is still running.
+
+    """
     def __init__(self, nreps=1, title='dftbJob',
-                 sbatch_filename='dftbp.sbatch'):
+                 sbatch_filename='dftbp.sbatch', hsd_filename=None,
+                 array=False, clients_per_job=1, backend=None,
+                 replica_db=None, replica_tool=None, stale=300,
+                 submit_timeout=3600):
+        if backend is None:
+            backend = SlurmBackend()
+        claim = None
+        record = None
+        if replica_db is not None and replica_tool is not None:
+            claim = 'python3 {} {} claim --stale {} --submit-timeout {} ' \
+                    '--pack {:d}'.format(replica_tool, replica_db, stale,
+                                         submit_timeout, int(clients_per_job))
+            record = 'python3 {} {} submitted'.format(replica_tool,
+                                                      replica_db)
+        parsable = claim is not None
 
-        self.script_file = """#!/bin/bash
+        nreps = int(nreps)
+        clients_per_job = int(clients_per_job)
+        packed = clients_per_job > 1
+        if hsd_filename is None:
+            copy_input = 'cp -f ../dftb_in.hsd .'
+        else:
+            copy_input = \
+                'cp -f ../`printf \'{}\' $1` dftb_in.hsd'.format(hsd_filename)
+
+        if array:
+            submit = '    jobs="$jobs,$1"'
+            submit_array = """
+jobs=${{jobs#,}}
+if [[ -z $jobs ]]; then
+    echo "All the replicas are already running"
+    exit 0
+fi
+sed s/pippopluto_title/{title}/g {sbatch_filename} > $TMPFILE; mv $TMPFILE dftb.array.sh
+echo "Submitting jobs $jobs as a job array"
+{submit_array}
+""".format(title=title, sbatch_filename=sbatch_filename,
+           submit_array=backend.submit_array('dftb.array.sh', '$jobs',
+                                             parsable))
+            if parsable:
+                submit_array = submit_array.rstrip('\n') + \
+                    ' | while read index job; do\n' \
+                    '    record_pack $index $job\n' \
+                    'done\n'
+        elif packed:
+            submit = """    sed s/pippopluto_title/{title}-$1/g {sbatch_filename} > $TMPFILE; mv $TMPFILE dftb.pack.sh
+    {submit_job}""".format(
+                title=title, sbatch_filename=sbatch_filename,
+                submit_job=backend.submit_job('dftb.pack.sh', 'PACK_ID=$1',
+                                              parsable))
+            submit_array = ''
+        else:
+            submit = """    sed s/pippopluto_title/{title}-$1/g ../{sbatch_filename} > $TMPFILE; mv $TMPFILE dftb.dftbp.sh
+    {submit_job}""".format(title=title,
+                                 sbatch_filename=sbatch_filename,
+                                 submit_job=backend.submit_job('dftb.dftbp.sh',
+                                                               'REPLICA_ID=$1',
+                                                               parsable))
+            submit_array = ''
+        if parsable and not array:
+            head, _, job = submit.rpartition('\n')
+            submit = head + '\n    job=$({})\n'.format(job.strip()) + \
+                '    record_pack $1 $job'
+
+        if claim is not None:
+            body = self._claimed(nreps, clients_per_job, copy_input, submit,
+                                 claim, record)
+        elif packed:
+            body = self._packed(nreps, clients_per_job, copy_input, submit)
+        else:
+            body = self._single(nreps, copy_input, submit)
+        self.script_file = body + submit_array
+        self.write()
+
+    @staticmethod
+    def _single(nreps, copy_input, submit):
+        """One job (or array task) per replica."""
+        return """#!/bin/bash
 
 dftb_sessions={nreps}
 
 TMPFILE=submit.$$
+jobs=''
 
 function start_dftb() {{
     touch RUNNING_DFTBP.lock
-    cp -f ../dftb_in.hsd .
-    sed s/pippopluto_title/{title}-$1/g ../{sbatch_filename} > $TMPFILE; mv $TMPFILE dftb.dftbp.sh
-    sbatch dftb.dftbp.sh
+    {copy_input}
+{submit}
 }}
 
 for i in `seq 1 $dftb_sessions`; do
-    name=`printf 'REM-%03i' $i`
+    name=`printf '{replica_dir}' $i`
     if [[ -e $name ]]; then
         echo "Directory $name exists, checking if used.."
         cd $name
@@ -93,15 +210,137 @@ for i in `seq 1 $dftb_sessions`; do
         cd ..
     fi
 done
-""".format(nreps=nreps, title=title, sbatch_filename=sbatch_filename)
-        self.write()
+""".format(nreps=nreps, copy_input=copy_input, submit=submit,
+           replica_dir=REPLICA_DIR)
+
+    @staticmethod
+    def _packed(nreps, clients_per_job, copy_input, submit):
+        """One job (or array task) per group of clients_per_job replicas."""
+        njobs = (nreps + clients_per_job - 1) // clients_per_job
+        return """#!/bin/bash
+
+dftb_sessions={nreps}
+clients_per_job={clients_per_job}
+njobs={njobs}
+
+TMPFILE=submit.$$
+jobs=''
+
+function prepare_dftb() {{
+    touch RUNNING_DFTBP.lock
+    {copy_input}
+}}
+
+function start_pack() {{
+{submit}
+}}
+
+for p in `seq 1 $njobs`; do
+    first=$(( (p - 1) * clients_per_job + 1 ))
+    last=$(( p * clients_per_job ))
+    if [[ $last -gt $dftb_sessions ]]; then
+        last=$dftb_sessions
+    fi
+    used=''
+    for i in `seq $first $last`; do
+        name=`printf '{replica_dir}' $i`
+        if [[ -e $name/RUNNING_DFTBP.lock ]]; then
+            used="$used $name"
+        fi
+    done
+    if [[ -n $used ]]; then
+        echo "Job $p still running in:$used"
+        continue
+    fi
+    echo "Starting replicas $first-$last in job $p"
+    for i in `seq $first $last`; do
+        name=`printf '{replica_dir}' $i`
+        mkdir -p $name
+        cd $name
+        prepare_dftb $i
+        cd ..
+    done
+    start_pack $p
+done
+""".format(nreps=nreps, clients_per_job=clients_per_job, njobs=njobs,
+           copy_input=copy_input, submit=submit, replica_dir=REPLICA_DIR)
+
+    @staticmethod
+    def _claimed(nreps, clients_per_job, copy_input, submit, claim, record):
+        """Start the jobs the replica database reports as dead."""
+        return """#!/bin/bash
+
+dftb_sessions={nreps}
+clients_per_job={clients_per_job}
+
+TMPFILE=submit.$$
+jobs=''
+
+# Replicas given as arguments: restart only those
+only=''
+if [[ $# -gt 0 ]]; then
+    only="--replicas $*"
+fi
+
+function prepare_dftb() {{
+    touch RUNNING_DFTBP.lock
+    {copy_input}
+}}
+
+function start_pack() {{
+{submit}
+}}
+
+# Record the job of pack $1 (id $2) in the database; without id the replicas
+# are restarted once the submit timeout is over
+function record_pack() {{
+    local first=$(( ($1 - 1) * clients_per_job + 1 ))
+    local last=$(( $1 * clients_per_job ))
+    if [[ $last -gt $dftb_sessions ]]; then
+        last=$dftb_sessions
+    fi
+    if [[ -z $2 ]]; then
+        echo "No job id for the replicas $first-$last"
+        return
+    fi
+    echo "Replicas $first-$last submitted as job $2"
+    {record} `seq $first $last` --job $2
+}}
+
+for p in `{claim} $only`; do
+    first=$(( (p - 1) * clients_per_job + 1 ))
+    last=$(( p * clients_per_job ))
+    if [[ $last -gt $dftb_sessions ]]; then
+        last=$dftb_sessions
+    fi
+    echo "Starting replicas $first-$last"
+    for i in `seq $first $last`; do
+        name=`printf '{replica_dir}' $i`
+        mkdir -p $name
+        cd $name
+        prepare_dftb $i
+        cd ..
+    done
+    if [[ $clients_per_job -gt 1 ]]; then
+        start_pack $p
+    else
+        cd $name
+        start_pack $p
+        cd ..
+    fi
+done
+""".format(nreps=nreps, clients_per_job=clients_per_job,
+           copy_input=copy_input, submit=submit, claim=claim,
+           record=record, replica_dir=REPLICA_DIR)
 
     def write(self):
         return self.script_file
 
 class runManyPlumedScript(object):
     def __init__(self, nreps=1, title='plumedJob',
-                 sbatch_filename='plumed.sbatch'):
+                 sbatch_filename='plumed.sbatch', backend=None):
+        if backend is None:
+            backend = SlurmBackend()
 
         self.script_file = """#!/bin/bash
 
@@ -116,7 +355,7 @@ function start_plumed() {{
     touch RUNNING_PLUMED.lock
     cp -f ../plumed.dat ../*.pdb .
     sed s/pippopluto_title/plu-{title}-$1/g ../{sbatch_filename} > $TMPFILE; mv $TMPFILE plumed.sbatch.sh
-    sbatch plumed.sbatch.sh
+    {submit_job}
 }}
 
 for i in `seq 1 $plumed_sessions`; do
@@ -139,7 +378,8 @@ for i in `seq 1 $plumed_sessions`; do
         cd ..
     fi
 done
-""".format(nreps=nreps, title=title, sbatch_filename=sbatch_filename)
+""".format(nreps=nreps, title=title, sbatch_filename=sbatch_filename,
+           submit_job=backend.submit_job('plumed.sbatch.sh'))
         self.write()
 
     def write(self):
@@ -41,6 +41,8 @@ import os
 import sys
 import shutil
 import re
+from slurm.make_runMany import REPLICA_DIR
+from slurm.backends import SlurmBackend
 
 # Try determining the version from git:
 try:
@@ -64,29 +66,82 @@ __status__ = 'development'
 
 class SbatchDftbScript(object):
     """ Create the sbatch file for dftb+.
+
+    If natom and charges_checker are given the job restarts the SCC from the
+    charges.bin left in the working directory by the previous run (when it is
+    valid for natom atoms) and copies back the new charges only when they are
+    complete.
+
+    If array is True the script is written for a job array: each task runs
+    the replica whose number is the array index of the task, in the
+    REPLICA_DIR directory below the submission directory.
+
+    If cores_per_node is given, each job packs as many clients as fit in a
+    node (see clients_per_job): job number PACK_ID (or the array index)
+    runs the replicas from (PACK_ID - 1) * K + 1 to PACK_ID * K, each one
+    started with the launcher of the backend (srun on SLURM).
+
+    The scheduler specific parts of the script come from backend (see
+    slurm.backends), SLURM by default.
+
+    If staging (a slurm.staging.StagingScript) is given, the scratch of each
+    client is synchronised with its working directory while dftb+ runs and
+    the copy at the end of the job is a bounded flush of the last changes.
+
+    If replica_db and replica_tool (the database and the slurm/replica_db.py
+    script) are given, each client sends a heartbeat to the database every
+    heartbeat seconds while it runs and marks its replica as done at the end
+    (finished once the RESTART of i-PI, next to the database, reached
+    total_steps).
     """
     # pylint: disable=too-many-instance-attributes
     # Maybe pylint is right.... btw
 
     def __init__(self, title='dftbJob', mem=1000, task_per_node=1,
-                 executable='dftb+', home='/home/student'):
+                 executable='dftb+', home='/home/student', natom=None,
+                 charges_checker=None, array=False, nreps=1,
+                 cores_per_node=None, staging=None, backend=None,
+                 replica_db=None, replica_tool=None, heartbeat=60,
+                 walltime=None):
+        if backend is None:
+            backend = SlurmBackend()
+        self.backend = backend
         self.workdir = '$PWD'
+        self.array = array
         self.title = os.path.basename(title)
         self.mem = mem
+        self.walltime = walltime
         self.nodes = 1
         self.ntasks_per_nodes = task_per_node
-        self.stderr = os.path.join(home, 'err',
-                                   os.path.basename(str(title)) + 'stderr_%j')
-        self.stdout = os.path.join(home, 'err',
-                                   os.path.basename(str(title)) + 'stdout_%j')
+        self.nreps = int(nreps)
+        self.cores_per_node = cores_per_node
+        self.stderr = backend.log_path(home, title, 'stderr', array)
+        self.stdout = backend.log_path(home, title, 'stdout', array)
         self.inputfile = 'dftb_in.hsd'
         self.outputfile = 'dftb.out'
+        self.natom = natom
+        self.charges_checker = charges_checker
+        self.staging = staging
+        self.replica_db = replica_db
+        self.replica_tool = replica_tool
+        self.heartbeat = int(heartbeat)
 
         self.config = dict(
             sources=['intel/15.0.3',],
             bin=executable,
         )
 
+    def clients_per_job(self):
+        """Number of dftb+ clients that fit in one node.
+
+        Each client uses ntasks_per_nodes threads. Without cores_per_node
+        every job runs one client.
+
+        """
+        if not self.cores_per_node:
+            return 1
+        return max(1, int(self.cores_per_node) // int(self.ntasks_per_nodes))
+
     def check_all(self):
         """ Validate all the parameters.
         """
@@ -109,9 +164,61 @@ class SbatchDftbScript(object):
 
         # Check if the stdout and stderr are writable
         for path in [self.stderr, self.stdout]:
+            if path is None:
+                continue
             if not os.access(os.path.dirname(path), os.W_OK):
                 raise(PermissionError('The directory {:s} is not writable!'.format(str(path))))
 
+    def _resources(self):
+        """Return the directives describing the resources of the job."""
+        clients = self.clients_per_job()
+        mem = int(self.mem) * clients
+        if clients == 1:
+            msg = self.backend.header(self.title, self.stderr, self.stdout,
+                                      mem, self.ntasks_per_nodes,
+                                      walltime=self.walltime)
+        else:
+            msg = self.backend.header(self.title, self.stderr, self.stdout,
+                                      mem, clients, self.ntasks_per_nodes,
+                                      walltime=self.walltime)
+        if self.staging is not None:
+            msg += self.backend.signal(self.staging.lead_time())
+        return msg
+
+    def _client_dirs(self):
+        """Return the script filling CLIENT_DIRS with the replicas to run.
+
+        CLIENT_IDS holds the numbers of the same replicas.
+
+        """
+        clients = self.clients_per_job()
+        if clients > 1:
+            return """PACK_ID=${{PACK_ID:-{task_id}}}
+CLIENT_DIRS=()
+CLIENT_IDS=()
+for i in `seq $(( (PACK_ID - 1) * {clients} + 1 )) $(( PACK_ID * {clients} ))`; do
+    if [[ $i -le {nreps} ]]; then
+        CLIENT_DIRS+=({submit_dir}/`printf '{replica_dir}' $i`)
+        CLIENT_IDS+=($i)
+    fi
+done
+""".format(clients=clients, nreps=self.nreps, replica_dir=REPLICA_DIR,
+           task_id=self.backend.task_id,
+           submit_dir=self.backend.submit_dir)
+        if self.array:
+            return "CLIENT_DIRS=({0}/`printf '{1}' {2}`)\n" \
+                   "CLIENT_IDS=({2})\n".format(self.backend.submit_dir,
+                                               REPLICA_DIR,
+                                               self.backend.task_id)
+        return 'CLIENT_DIRS=({})\nCLIENT_IDS=(${{REPLICA_ID:-1}})\n'.format(
+            self.workdir)
+
+    def _launcher(self):
+        """Return the command prefix starting one client of the job."""
+        if self.clients_per_job() == 1:
+            return ''
+        return self.backend.launcher(self.ntasks_per_nodes)
+
     def write(self):
         """ Write the sbatch file.
         """
@@ -119,18 +226,11 @@ class SbatchDftbScript(object):
 
         init = \
             """#!/bin/bash
-#SBATCH -J {title}
-#SBATCH -e {stderr}
-#SBATCH -o {stdout}
-#SBATCH --mem={mem}
-#SBATCH --nodes={nodes}
-#SBATCH --ntasks-per-node={ntasks_per_node}
-
-INPUTFILE={inputfile}
-WORKING_DIR={workdir}
-TMP_DIR=$SLURM_TMPDIR
-
-export OMP_NUM_THREADS={ntasks_per_node}
+{resources}
+{prologue}INPUTFILE={inputfile}
+TMP_DIR={tmpdir}
+
+export OMP_NUM_THREADS={threads}
 """.format
 
         sources = ''
@@ -139,45 +239,158 @@ export OMP_NUM_THREADS={ntasks_per_node}
 
         functions = \
             """
+{client_dirs}
 function coping_back() {
-    rsync -ca $TMP_DIR/ $WORKING_DIR/
-    if [[ -e $WORKING_DIR/RUNNING_DFTBP.lock ]]; then
+    local WORKING_DIR=$1
+    local TMP_DIR=$2
+    {copy} {exclude}
+{keep_charges}    if [[ -e $WORKING_DIR/RUNNING_DFTBP.lock ]]; then
         rm -f $WORKING_DIR/RUNNING_DFTBP.lock
     fi
 }
 
-trap 'coping_back' TERM EXIT
+function coping_back_all() {
+{stop_staging}{stop_heartbeat}    for i in ${!CLIENT_DIRS[@]}; do
+        coping_back ${CLIENT_DIRS[$i]} $TMP_DIR/client-$i
+{finish}    done
+}
+
+trap 'coping_back_all' TERM EXIT
 
 """
 
+        warm_start = self._warm_start()
+        functions = functions.replace('{client_dirs}', self._client_dirs())
+        functions = functions.replace('{copy}', self._copy())
+        functions = functions.replace('{exclude}', warm_start['exclude'])
+        functions = functions.replace('{keep_charges}', warm_start['keep'])
+        if self.staging is None:
+            functions = functions.replace('{stop_staging}', '')
+        else:
+            functions = functions.replace('{stop_staging}',
+                                          '    stop_staging\n')
+            functions = self.staging.write() + functions
+        heartbeat = self._heartbeat()
+        functions = functions.replace('{stop_heartbeat}', heartbeat['stop'])
+        functions = functions.replace('{finish}', heartbeat['finish'])
+        functions = heartbeat['functions'] + functions
+
         works = \
             """
-cd $TMP_DIR
-cp -ar $WORKING_DIR/dftb_in.hsd $TMP_DIR
-
-touch $WORKING_DIR/RUNNING_DFTBP.lock
-{bin} dftb_in.hsd > {outputdir}/{outputfile}
-
-exit()
+function run_dftb() {{
+    local WORKING_DIR=$1
+    local TMP_DIR=$2
+    mkdir -p $TMP_DIR
+    cd $TMP_DIR
+    cp -ar $WORKING_DIR/dftb_in.hsd $TMP_DIR
+{read_charges}
+    touch $WORKING_DIR/RUNNING_DFTBP.lock
+    {launcher}{bin} dftb_in.hsd > {outputdir}/{outputfile}
+}}
+
+CLIENT_PIDS=''
+for i in ${{!CLIENT_DIRS[@]}}; do
+    run_dftb ${{CLIENT_DIRS[$i]}} $TMP_DIR/client-$i &
+    CLIENT_PIDS="$CLIENT_PIDS $!"
+{start_staging}{start_heartbeat}done
+wait $CLIENT_PIDS
+
+exit
 """.format
 
         msg = \
-              init(title=self.title,
-                   stderr=self.stderr,
-                   stdout=self.stdout,
-                   mem=self.mem,
-                   nodes=self.nodes,
-                   ntasks_per_node=self.ntasks_per_nodes,
-                   inputfile=self.inputfile,
-                   workdir=self.workdir, ) + \
+              init(resources=self._resources(),
+                   prologue=self.backend.prologue(),
+                   tmpdir=self.backend.tmpdir,
+                   threads=self.ntasks_per_nodes,
+                   inputfile=self.inputfile, ) + \
               sources + \
               functions + \
               works(bin=self.config['bin'],
+                    launcher=self._launcher(),
                     outputfile=self.outputfile,
-                    outputdir=self.outputdir)
+                    outputdir=self.outputdir,
+                    start_staging=self._start_staging(
+                        warm_start['exclude']),
+                    start_heartbeat=heartbeat['start'],
+                    read_charges=warm_start['read'])
 
         return msg
 
+    def _copy(self):
+        """Return the command copying TMP_DIR back to WORKING_DIR."""
+        if self.staging is None:
+            return 'rsync -ca $TMP_DIR/ $WORKING_DIR/'
+        return 'final_flush $TMP_DIR $WORKING_DIR'
+
+    def _start_staging(self, exclude):
+        """Return the line starting the staging of client i."""
+        if self.staging is None:
+            return ''
+        return '    start_staging $TMP_DIR/client-$i ${{CLIENT_DIRS[$i]}} ' \
+               '{}\n'.format(exclude)
+
+    def _heartbeat(self):
+        """Return the pieces of script updating the replica database."""
+        pieces = dict(functions='', stop='', finish='', start='')
+        if self.replica_db is None or self.replica_tool is None:
+            return pieces
+        pieces['functions'] = \
+            """
+REPLICA_DB="python3 {tool} {db}"
+HEARTBEAT_PIDS=''
+
+function start_heartbeat() {{
+    $REPLICA_DB beat $1 --job {job_id}
+    ( while sleep {interval}; do
+          $REPLICA_DB beat $1
+      done ) &
+    HEARTBEAT_PIDS="$HEARTBEAT_PIDS $!"
+}}
+""".format(tool=self.replica_tool, db=self.replica_db,
+           job_id=self.backend.job_id, interval=self.heartbeat)
+        pieces['stop'] = \
+            '    if [[ -n $HEARTBEAT_PIDS ]]; then\n' \
+            '        kill $HEARTBEAT_PIDS 2>/dev/null\n' \
+            '    fi\n' \
+            "    HEARTBEAT_PIDS=''\n"
+        # i-PI runs (and writes its RESTART) next to the database
+        restart = os.path.join(os.path.dirname(self.replica_db), 'RESTART')
+        pieces['finish'] = '        $REPLICA_DB finish ${{CLIENT_IDS[$i]}} ' \
+                           '--restart {}\n'.format(restart)
+        pieces['start'] = '    start_heartbeat ${CLIENT_IDS[$i]}\n'
+        return pieces
+
+    def _warm_start(self):
+        """Return the pieces of script that take care of the charges.bin.
+
+        The charges.bin of the previous run is used (and ReadInitialCharges
+        switched on) only if the checker validates it. At the end of the run
+        the new charges.bin replaces the old one only if it is valid too: a
+        truncated file written while the job was killed would otherwise spoil
+        the next restart.
+
+        """
+        pieces = dict(exclude='', keep='', read='')
+        if self.natom is None or self.charges_checker is None:
+            return pieces
+
+        check = 'python3 {checker} {{path}} {natom}'.format(
+            checker=self.charges_checker, natom=self.natom).format
+        pieces['exclude'] = '--exclude charges.bin '
+        pieces['keep'] = \
+            """    if {check}; then
+        cp -f $TMP_DIR/charges.bin $WORKING_DIR/charges.bin.tmp
+        mv -f $WORKING_DIR/charges.bin.tmp $WORKING_DIR/charges.bin
+    fi
+""".format(check=check(path='$TMP_DIR/charges.bin'))
+        pieces['read'] = \
+            """    if {check}; then
+        cp -a $WORKING_DIR/charges.bin $TMP_DIR
+        sed -i 's/ReadInitialCharges = No/ReadInitialCharges = Yes/' dftb_in.hsd
+    fi""".format(check=check(path='$WORKING_DIR/charges.bin'))
+        return pieces
+
 
 class FileNotFound(Exception):
     def __init__(self, context, filename):
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: replica_db
+# Creation: Oct 19, 2026
+#
+
+"""State of the replicas of a REM, kept in a SQLite database.
+
+Each replica has one row with its directory, the job running it, its state
+and the time of its last heartbeat::
+
+    new        never started
+    submitted  given to the scheduler, not yet running
+    running    the job is alive and beats regularly
+    done       the job ended (normally or killed with the trap firing)
+    finished   the job ended after i-PI reached total_steps
+
+A replica is *dead* when it is new or done, when it is running but its
+heartbeat is older than the stale time (this catches the jobs killed without
+running their trap, which used to leave their lock file behind forever), or
+when it is submitted since longer than the submit timeout: the submission
+failed, or the job died before its first heartbeat. runMany.sh records the id
+of the job right after the submission, so that the watchdog can ask the
+scheduler about the submitted replicas; it refreshes the heartbeat of the
+ones whose job is still queued, so that they do not reach the timeout.
+
+A finished replica is never restarted: the job marks its replicas finished
+when the i-PI RESTART file says that the run is over (see ipi_finished), and
+the watchdog does the same for all the idle replicas.
+
+The script is also the command line tool used by the job scripts and by
+runMany.sh::
+
+    $ python3 replica_db.py replicas.db init 500
+    $ python3 replica_db.py replicas.db claim --stale 300 --submit-timeout 3600
+    $ python3 replica_db.py replicas.db submitted 12 13 --job 4242
+    $ python3 replica_db.py replicas.db beat 12 --job 4242
+    $ python3 replica_db.py replicas.db finish 12 --restart RESTART
+    $ python3 replica_db.py replicas.db list
+
+claim prints the dead replicas (or packs of replicas) and marks them as
+submitted in the same transaction.
+
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from xml.etree import ElementTree
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+# Same as slurm.make_runMany.REPLICA_DIR: this file runs as a standalone
+# script on the nodes, without the rest of the package
+REPLICA_DIR = 'REM-%03i'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS replica (
+    replica   INTEGER PRIMARY KEY,
+    directory TEXT NOT NULL,
+    job_id    TEXT,
+    state     TEXT NOT NULL DEFAULT 'new',
+    heartbeat REAL,
+    claimed   REAL
+);
+CREATE INDEX IF NOT EXISTS replica_state ON replica (state, heartbeat);
+"""
+
+
+def ipi_finished(restart):
+    """Return True if the i-PI restart file reached total_steps.
+
+    Same test as the chained allInOne script. A missing or unreadable file
+    means that the run is not over.
+
+    """
+    try:
+        root = ElementTree.parse(restart).getroot()
+        return (int(root.find('step').text) >=
+                int(root.find('total_steps').text) - 1)
+    except (OSError, ElementTree.ParseError, AttributeError, ValueError):
+        return False
+
+
+class ReplicaDb(object):
+    """Access to the replica database.
+
+    Args:
+        path: the SQLite file, created if missing.
+        timeout: seconds to wait for a lock held by another process (all the
+            jobs write in the same file).
+
+    """
+    def __init__(self, path='replicas.db', timeout=60.0):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=timeout,
+                                    isolation_level=None)
+        self.conn.executescript(SCHEMA)
+        columns = [row[1] for row in
+                   self.conn.execute('PRAGMA table_info(replica)')]
+        if 'claimed' not in columns:
+            # Database written by an older version
+            self.conn.execute('ALTER TABLE replica ADD COLUMN claimed REAL')
+
+    def close(self):
+        self.conn.close()
+
+    def _transaction(self, statements):
+        """Run (sql, parameters) couples in one write transaction."""
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            results = [cursor.execute(sql, params).fetchall()
+                       for sql, params in statements]
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        cursor.execute('COMMIT')
+        return results
+
+    def init(self, nreps, basedir='.'):
+        """Add the replicas from 1 to nreps that are not there yet."""
+        rows = [(i, os.path.join(basedir, REPLICA_DIR % i))
+                for i in range(1, int(nreps) + 1)]
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.executemany('INSERT OR IGNORE INTO replica (replica, directory)'
+                           ' VALUES (?, ?)', rows)
+        cursor.execute('COMMIT')
+
+    def beat(self, replica, job_id=None, state='running'):
+        """Record that replica is alive now."""
+        self._transaction([(
+            'UPDATE replica SET state = ?, heartbeat = ?, '
+            'job_id = COALESCE(?, job_id) WHERE replica = ?',
+            (state, time.time(), job_id, int(replica)))])
+
+    def finish(self, replica, state='done'):
+        self._transaction([(
+            'UPDATE replica SET state = ?, heartbeat = ? WHERE replica = ?',
+            (state, time.time(), int(replica)))])
+
+    def finish_idle(self, stale=300):
+        """Mark as finished the replicas that are not running: i-PI is over.
+
+        The running replicas with a stale heartbeat are finished too.
+
+        """
+        self._transaction([(
+            "UPDATE replica SET state = 'finished' WHERE state != 'running' "
+            "OR heartbeat < ?", (time.time() - float(stale),))])
+
+    def complete(self):
+        """Return True if all the replicas are finished."""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM replica WHERE state != 'finished'"
+        ).fetchone()[0] == 0
+
+    def submitted(self, replicas, job_id):
+        """Record the job of replicas just submitted.
+
+        The replicas whose job already started (and beat) are left alone.
+
+        """
+        self._transaction([(
+            "UPDATE replica SET job_id = ? "
+            "WHERE replica = ? AND state = 'submitted'",
+            (str(job_id), int(replica))) for replica in replicas])
+
+    def pending(self, replica):
+        """Record that the job of a submitted replica is still queued."""
+        self._transaction([(
+            "UPDATE replica SET heartbeat = ? "
+            "WHERE replica = ? AND state = 'submitted'",
+            (time.time(), int(replica)))])
+
+    @staticmethod
+    def _dead_sql(stale, submit_timeout):
+        now = time.time()
+        return ("SELECT replica FROM replica WHERE state IN ('new', 'done') "
+                "OR (state = 'running' AND heartbeat < ?) "
+                "OR (state = 'submitted' AND heartbeat < ?) ORDER BY replica",
+                (now - float(stale), now - float(submit_timeout)))
+
+    def dead(self, stale=300, submit_timeout=3600):
+        """Replicas that have to be (re)started."""
+        sql, params = self._dead_sql(stale, submit_timeout)
+        return [row[0] for row in self.conn.execute(sql, params)]
+
+    def claim(self, stale=300, pack=1, replicas=None, submit_timeout=3600):
+        """Return the dead replicas and mark them as submitted.
+
+        With pack > 1 the replicas are grouped as the packed jobs do (pack p
+        holds the replicas from (p - 1) * pack + 1 to p * pack) and the
+        numbers of the packs whose replicas are all dead are returned.
+
+        If replicas is given, only the replicas (or the packs containing
+        them) in the list are claimed. The id of the new job is recorded
+        afterwards with submitted.
+
+        """
+        sql, params = self._dead_sql(stale, submit_timeout)
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            dead = set(row[0] for row in cursor.execute(sql, params))
+            everyone = [row[0] for row in
+                        cursor.execute('SELECT replica FROM replica')]
+            pack = int(pack)
+            members = {}
+            for replica in everyone:
+                members.setdefault((replica - 1) // pack + 1, []).append(
+                    replica)
+            claimed = sorted(p for p, reps in members.items()
+                             if dead.issuperset(reps))
+            if replicas is not None:
+                wanted = set((int(r) - 1) // pack + 1 for r in replicas)
+                claimed = [p for p in claimed if p in wanted]
+            now = time.time()
+            rows = [(now, now, r) for p in claimed for r in members[p]]
+            cursor.executemany("UPDATE replica SET state = 'submitted', "
+                               "heartbeat = ?, claimed = ?, job_id = NULL "
+                               "WHERE replica = ?", rows)
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        cursor.execute('COMMIT')
+        return claimed
+
+    def claimed_since(self, since):
+        """Replicas claimed at since or later."""
+        return [row[0] for row in self.conn.execute(
+            'SELECT replica FROM replica WHERE claimed >= ? ORDER BY replica',
+            (since,))]
+
+    def running(self):
+        """The running replicas, as (replica, directory, job_id, heartbeat)."""
+        return self._in_state('running')
+
+    def waiting(self):
+        """The submitted replicas, as (replica, directory, job_id, heartbeat)."""
+        return self._in_state('submitted')
+
+    def _in_state(self, state):
+        return self.conn.execute(
+            "SELECT replica, directory, job_id, heartbeat FROM replica "
+            "WHERE state = ? ORDER BY replica", (state,)).fetchall()
+
+    def rows(self):
+        """All the rows, as (replica, directory, job_id, state, heartbeat)."""
+        return self.conn.execute(
+            'SELECT replica, directory, job_id, state, heartbeat '
+            'FROM replica ORDER BY replica').fetchall()
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        description='Query and update the state of the REM replicas.')
+    parser.add_argument('db', help='The replica database')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    init = commands.add_parser('init', help='Add the replicas 1..NREPS')
+    init.add_argument('nreps', type=int)
+
+    claim = commands.add_parser('claim',
+                                help='Print the dead replicas (or packs) and '
+                                     'mark them as submitted')
+    claim.add_argument('--stale', type=float, default=300,
+                       help='Seconds without heartbeat before a running '
+                            'replica is dead')
+    claim.add_argument('--submit-timeout', type=float, default=3600,
+                       help='Seconds a submitted replica may wait for its '
+                            'job to start')
+    claim.add_argument('--pack', type=int, default=1,
+                       help='Replicas per job')
+    claim.add_argument('--replicas', type=int, nargs='+', default=None,
+                       help='Claim only these replicas')
+
+    submitted = commands.add_parser('submitted',
+                                    help='Record the job of submitted '
+                                         'replicas')
+    submitted.add_argument('replicas', type=int, nargs='+')
+    submitted.add_argument('--job', required=True,
+                           help='Id of the submitted job')
+
+    dead = commands.add_parser('dead', help='Print the dead replicas')
+    dead.add_argument('--stale', type=float, default=300)
+    dead.add_argument('--submit-timeout', type=float, default=3600)
+
+    beat = commands.add_parser('beat', help='Heartbeat of a replica')
+    beat.add_argument('replica', type=int)
+    beat.add_argument('--job', default=None, help='Id of the running job')
+
+    finish = commands.add_parser('finish', help='The job of a replica ended')
+    finish.add_argument('replica', type=int)
+    finish.add_argument('--restart', default=None,
+                        help='RESTART file of i-PI: if the run is over the '
+                             'replica is finished and never restarted')
+
+    commands.add_parser('list', help='Print the whole table')
+    return parser.parse_args()
+
+
+def main():
+    args = _parser()
+    db = ReplicaDb(args.db)
+    if args.command == 'init':
+        db.init(args.nreps, os.path.dirname(os.path.abspath(args.db)))
+    elif args.command == 'claim':
+        for item in db.claim(args.stale, args.pack, args.replicas,
+                             args.submit_timeout):
+            print(item)
+    elif args.command == 'submitted':
+        db.submitted(args.replicas, args.job)
+    elif args.command == 'dead':
+        for item in db.dead(args.stale, args.submit_timeout):
+            print(item)
+    elif args.command == 'beat':
+        db.beat(args.replica, args.job)
+    elif args.command == 'finish':
+        if args.restart is not None and ipi_finished(args.restart):
+            db.finish(args.replica, 'finished')
+        else:
+            db.finish(args.replica)
+    elif args.command == 'list':
+        now = time.time()
+        for replica, directory, job_id, state, heartbeat in db.rows():
+            age = '-' if heartbeat is None else '{:.0f}s'.format(
+                now - heartbeat)
+            sys.stdout.write('{:5d} {:10s} {:>12s} {:>8s} {}\n'.format(
+                replica, state, str(job_id or '-'), age, directory))
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
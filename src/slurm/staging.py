@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: staging
+# Creation: Oct 19, 2026
+#
+
+"""Bash functions copying the local scratch back to the working directory.
+
+The jobs run in the local scratch of the node and the results have to go back
+to the working directory. Copying everything only when the job ends is slow
+for large outputs and, if the job is killed at the walltime limit before the
+copy is over, everything is lost. Here the scratch is synchronised
+periodically while the job runs (rsync quick check on size and modification
+time, no checksum), so that at the end only the last changes are left and the
+final flush can be bounded in time.
+
+"""
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+class StagingScript(object):
+    """Write the staging functions for a job script.
+
+    The functions defined in the script are:
+
+    start_staging SRC DEST [RSYNC OPTIONS]
+        starts a background loop copying SRC into DEST every interval
+        seconds;
+    stop_staging
+        stops all the loops started by the job, and the rsync they are
+        running, and waits for them to be over;
+    final_flush SRC DEST [RSYNC OPTIONS]
+        copies SRC into DEST one last time, killing rsync after
+        flush_timeout seconds.
+
+    Args:
+        interval: seconds between two synchronisations.
+        flush_timeout: maximum duration (s) of the final flush.
+
+    """
+    def __init__(self, interval=600, flush_timeout=60):
+        self.interval = int(interval)
+        self.flush_timeout = int(flush_timeout)
+
+    def lead_time(self):
+        """Seconds before the walltime the job should receive a TERM.
+
+        The final flush has then the time to be over before the job is
+        killed (see the signal method of the scheduler backends).
+
+        """
+        return self.flush_timeout + 30
+
+    def write(self):
+        return """
+STAGE_INTERVAL={interval}
+FLUSH_TIMEOUT={flush_timeout}
+STAGING_PIDS=''
+
+# Each loop runs in its own process group: stopping it stops the rsync it is
+# running too, which otherwise would go on and race the final flush
+function start_staging() {{
+    setsid bash -c 'while sleep $0; do rsync -a "${{@:3}}" $1/ $2/; done' \
+        $STAGE_INTERVAL "$@" &
+    STAGING_PIDS="$STAGING_PIDS $!"
+}}
+
+function stop_staging() {{
+    local pid
+    for pid in $STAGING_PIDS; do
+        kill -TERM -- -$pid 2>/dev/null
+    done
+    for pid in $STAGING_PIDS; do
+        wait $pid 2>/dev/null
+        while kill -0 -- -$pid 2>/dev/null; do
+            sleep 0.2
+        done
+    done
+    STAGING_PIDS=''
+}}
+
+function final_flush() {{
+    timeout $FLUSH_TIMEOUT rsync -a "${{@:3}}" $1/ $2/
+}}
+""".format(interval=self.interval, flush_timeout=self.flush_timeout)
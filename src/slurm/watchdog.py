@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#
+# Project:  inputsGen
+# FileName: watchdog
+# Creation: Oct 19, 2026
+#
+
+"""Keep the dftb+ clients of a REM alive.
+
+When a client dies, i-PI waits for its timeout and the whole simulation
+stalls until runMany.sh is run again by hand. The watchdog does it instead:
+every interval seconds it looks at the replica database (see replica_db.py)
+and finds the dead clients:
+
+- the replicas that are done, or whose heartbeat is stale;
+- the running replicas whose job is no longer known to the scheduler;
+- the submitted replicas whose job is no longer known to the scheduler, or
+  that wait since longer than the submit timeout without a job id (the
+  submitted replicas whose job is still queued are kept fresh);
+- optionally, the running replicas whose output did not grow for stall
+  seconds (their job is cancelled).
+
+The dead replicas are resubmitted in their REM directory running the submit
+command, by default ``./runMany.sh {replicas}``. With packed jobs the command
+restarts only the packs whose replicas are all dead: the restarts are counted
+on the replicas it actually claimed (see replica_db.py). Two limits avoid
+hammering the scheduler when something is broken: at most max_submits
+replicas are resubmitted in any window of seconds, and a replica restarted n
+times waits backoff * 2^(n-1) seconds (at most max_backoff) before the next
+restart.
+
+Example:
+    $ python3 watchdog.py replicas.db --scheduler slurm --interval 60
+
+Once the i-PI RESTART file (--restart) reached total_steps nothing is
+resubmitted any more: the idle replicas are marked finished and the queued
+jobs cancelled. The watchdog stops when all the replicas are finished, or
+when the stop file appears: the ports of the run (--release-ports) are then
+given back to the port registry.
+
+"""
+
+import os
+import sys
+import time
+import argparse
+import collections
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from slurm.backends import BACKENDS
+from slurm.replica_db import ReplicaDb
+from slurm.replica_db import ipi_finished
+from ports.port_registry import PortRegistry
+
+# Try determining the version from git:
+try:
+    import subprocess
+    git_v = subprocess.check_output(['git', 'describe'],
+                                    stderr=subprocess.DEVNULL)
+except subprocess.CalledProcessError:
+    git_v = 'Not Yet Tagged!'
+
+
+__author__ = 'Riccardo Petraglia'
+__credits__ = ['Riccardo Petraglia']
+__updated__ = "2026-10-19"
+__license__ = 'GPLv2'
+__version__ = git_v
+__maintainer__ = 'Riccardo Petraglia'
+__email__ = 'riccardo.petraglia@gmail.com'
+__status__ = 'development'
+
+
+class Watchdog(object):
+    """Find the dead clients and resubmit them.
+
+    Args:
+        db: a ReplicaDb.
+        backend: the scheduler backend (see slurm.backends).
+        submit: command resubmitting the replicas, {replicas} is replaced
+            by their space separated numbers.
+        stale: seconds without heartbeat before a replica is dead.
+        submit_timeout: seconds a submitted replica may wait without news
+            of its job before it is dead.
+        stall: seconds without output growth before a replica is dead, None
+            to skip this check.
+        output: output file of dftb+ in the replica directory.
+        max_submits: maximum number of replicas resubmitted in window.
+        window: seconds of the rate limit window.
+        backoff: delay (s) before the second restart of a replica.
+        max_backoff: maximum delay (s) between two restarts.
+        restart: the RESTART file of i-PI, telling when the run is over.
+
+    """
+    def __init__(self, db, backend, submit='./runMany.sh {replicas}',
+                 stale=300, stall=None, output='dftb.out', max_submits=20,
+                 window=3600, backoff=60, max_backoff=3600,
+                 submit_timeout=3600, restart=None):
+        self.db = db
+        self.restart = restart
+        self.backend = backend
+        self.submit = submit
+        self.stale = stale
+        self.submit_timeout = submit_timeout
+        self.stall = stall
+        self.output = output
+        self.max_submits = int(max_submits)
+        self.window = window
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # replica -> (number of restarts, time of the last one)
+        self.restarts = {}
+        # replica -> (size of the output, since when)
+        self.outputs = {}
+        self.submissions = collections.deque()
+
+    @staticmethod
+    def log(msg):
+        sys.stdout.write('{} {}\n'.format(time.strftime('%Y-%m-%d %H:%M:%S'),
+                                          msg))
+        sys.stdout.flush()
+
+    def _stalled(self, replica, directory, now):
+        try:
+            size = os.path.getsize(os.path.join(directory, self.output))
+        except OSError:
+            size = -1
+        old = self.outputs.get(replica)
+        if old is None or old[0] != size:
+            self.outputs[replica] = (size, now)
+            return False
+        return now - old[1] > self.stall
+
+    def check(self, now):
+        """Mark as done the replicas whose job is dead."""
+        self._check_waiting()
+        running = self.db.running()
+        alive = set()
+        for replica, directory, job_id, heartbeat in running:
+            reason = None
+            if job_id is not None and self.backend.job_alive(job_id) is False:
+                reason = 'job {} is over'.format(job_id)
+            elif self.stall and self._stalled(replica, directory, now):
+                reason = 'no output for {:.0f} s'.format(self.stall)
+                if job_id is not None:
+                    self.backend.cancel(job_id)
+            if reason is None:
+                alive.add(replica)
+                # Running long enough after its last restart: healthy again
+                count, last = self.restarts.get(replica, (0, 0))
+                if count and now - last > self.max_backoff:
+                    del self.restarts[replica]
+            else:
+                self.log('Replica {}: {}'.format(replica, reason))
+                self.db.finish(replica)
+        for replica in list(self.outputs):
+            if replica not in alive:
+                del self.outputs[replica]
+
+    def _check_waiting(self):
+        """Look at the jobs of the submitted replicas.
+
+        The replicas without job id are left to the submit timeout.
+
+        """
+        for replica, directory, job_id, heartbeat in self.db.waiting():
+            if job_id is None:
+                continue
+            alive = self.backend.job_alive(job_id)
+            if alive is False:
+                self.log('Replica {}: job {} is over before starting'.format(
+                    replica, job_id))
+                self.db.finish(replica)
+            elif alive:
+                self.db.pending(replica)
+
+    def ipi_over(self):
+        """Return True if i-PI reached total_steps.
+
+        The idle replicas are then marked finished and the jobs still queued
+        are cancelled: there is nothing left for them to compute.
+
+        """
+        if self.restart is None or not ipi_finished(self.restart):
+            return False
+        for replica, directory, job_id, heartbeat in self.db.waiting():
+            if job_id is not None:
+                self.backend.cancel(job_id)
+        self.db.finish_idle(self.stale)
+        return True
+
+    def _delay(self, replica):
+        count = self.restarts.get(replica, (0, 0))[0]
+        if count == 0:
+            return 0
+        return min(self.max_backoff, self.backoff * 2 ** (count - 1))
+
+    def _budget(self, now):
+        while self.submissions and now - self.submissions[0] > self.window:
+            self.submissions.popleft()
+        return self.max_submits - len(self.submissions)
+
+    def resubmit(self, now):
+        """Resubmit the dead replicas out of their backoff, within budget."""
+        ready = [replica for replica in
+                 self.db.dead(self.stale, self.submit_timeout)
+                 if now >= self.restarts.get(replica, (0, 0))[1] +
+                 self._delay(replica)]
+        budget = self._budget(now)
+        if len(ready) > budget:
+            self.log('Rate limit: {} replicas wait'.format(
+                len(ready) - max(0, budget)))
+            ready = ready[:max(0, budget)]
+        if not ready:
+            return []
+        command = self.submit.format(replicas=' '.join(str(r) for r in ready))
+        self.log('Resubmitting: {}'.format(command))
+        since = time.time()
+        subprocess.call(command, shell=True)
+        # A pack with a member still alive is not claimed
+        claimed = [replica for replica in self.db.claimed_since(since)
+                   if replica in ready]
+        if len(claimed) < len(ready):
+            self.log('Not restarted (pack still running): {}'.format(
+                ' '.join(str(r) for r in ready if r not in claimed)))
+        for replica in claimed:
+            count = self.restarts.get(replica, (0, 0))[0]
+            self.restarts[replica] = (count + 1, now)
+            self.submissions.append(now)
+        return claimed
+
+    def run(self, interval=60, stop_file='WATCHDOG.stop', release=None):
+        """Watch until stop_file appears or all the replicas are finished.
+
+        The ports given are then released.
+
+        """
+        self.log('Watchdog started, create {} to stop it'.format(stop_file))
+        while not os.path.exists(stop_file):
+            now = time.time()
+            self.check(now)
+            if not self.ipi_over():
+                self.resubmit(now)
+            elif self.db.complete():
+                self.log('i-PI is over and all the replicas are finished')
+                break
+            time.sleep(interval)
+        if release:
+            PortRegistry().release(release)
+            self.log('Ports released: {}'.format(
+                ' '.join(str(p) for p in release)))
+        self.log('Watchdog stopped')
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        description='Resubmit the dead dftb+ clients of a REM.')
+    parser.add_argument('db', help='The replica database')
+    parser.add_argument('--scheduler', default='slurm',
+                        choices=sorted(BACKENDS))
+    parser.add_argument('--submit', default='./runMany.sh {replicas}',
+                        help='Command resubmitting the replicas')
+    parser.add_argument('--interval', type=float, default=60,
+                        help='Seconds between two checks')
+    parser.add_argument('--stale', type=float, default=300,
+                        help='Seconds without heartbeat before a replica is '
+                             'dead')
+    parser.add_argument('--submit-timeout', type=float, default=3600,
+                        help='Seconds a submitted replica may wait without '
+                             'news of its job before it is dead')
+    parser.add_argument('--stall', type=float, default=None,
+                        help='Seconds without output growth before a replica '
+                             'is dead (longer than the staging interval)')
+    parser.add_argument('--output', default='dftb.out',
+                        help='Output of dftb+ in the replica directory')
+    parser.add_argument('--max-submits', type=int, default=20,
+                        help='Replicas resubmitted at most in a window')
+    parser.add_argument('--window', type=float, default=3600,
+                        help='Seconds of the rate limit window')
+    parser.add_argument('--backoff', type=float, default=60,
+                        help='Delay before the second restart of a replica, '
+                             'doubled at each new restart')
+    parser.add_argument('--max-backoff', type=float, default=3600)
+    parser.add_argument('--stop-file', default='WATCHDOG.stop')
+    parser.add_argument('--restart', default=None,
+                        help='RESTART file of i-PI: once it reached '
+                             'total_steps the replicas are finished')
+    parser.add_argument('--release-ports', type=int, nargs='+', default=None,
+                        help='Ports of the run, released in the port '
+                             'registry when the watchdog stops')
+    return parser.parse_args()
+
+
+def main():
+    args = _parser()
+    if args.scheduler == 'local':
+        backend = BACKENDS[args.scheduler](None)
+    else:
+        backend = BACKENDS[args.scheduler]()
+    watchdog = Watchdog(ReplicaDb(args.db), backend, submit=args.submit,
+                        stale=args.stale, stall=args.stall,
+                        output=args.output, max_submits=args.max_submits,
+                        window=args.window, backoff=args.backoff,
+                        max_backoff=args.max_backoff,
+                        submit_timeout=args.submit_timeout,
+                        restart=args.restart)
+    watchdog.run(args.interval, args.stop_file, args.release_ports)
+
+
+if __name__ == '__main__':
+    main()